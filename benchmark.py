@@ -0,0 +1,649 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import project
+
+'''
+Benchmarks for the type coverage tool. None of them call the real API.
+
+By default this is a micro-benchmark for the coverage engines. It scores the 18-type Smeargle case
+with each engine, then scores a batch of made-up Pokemon learnsets at once with the numpy engine.
+
+With --suite it runs whole queries through main() against a local stand-in for PokeAPI that replays
+recorded responses, with optional injected latency. It measures end-to-end latency, HTTP requests per
+query, classify_moves throughput and coverage combos per second for a normal Pokemon, Smeargle and
+Ditto (no damaging moves), and writes the results as JSON so they can be compared between commits.
+The responses come from a fixture directory made with --record, or from made-up data shaped like
+PokeAPI's when no directory is given.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --pokemon 5000 --repeat 5
+    python benchmark.py --record fixtures
+    python benchmark.py --suite --fixtures fixtures --latency 20 --out baseline.json
+'''
+
+# Current (gen 6+) super effective chart, so the benchmark runs without the API
+TYPE_CHART = {
+    "normal": set(),
+    "fire": {"grass", "ice", "bug", "steel"},
+    "water": {"fire", "ground", "rock"},
+    "electric": {"water", "flying"},
+    "grass": {"water", "ground", "rock"},
+    "ice": {"grass", "ground", "flying", "dragon"},
+    "fighting": {"normal", "ice", "rock", "dark", "steel"},
+    "poison": {"grass", "fairy"},
+    "ground": {"fire", "electric", "poison", "rock", "steel"},
+    "flying": {"grass", "fighting", "bug"},
+    "psychic": {"fighting", "poison"},
+    "bug": {"grass", "psychic", "dark"},
+    "rock": {"fire", "ice", "flying", "bug"},
+    "ghost": {"psychic", "ghost"},
+    "dragon": {"dragon"},
+    "dark": {"psychic", "ghost"},
+    "steel": {"ice", "rock", "fairy"},
+    "fairy": {"fighting", "dragon", "dark"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pokemon", type=int, default=2000, help="Number of made-up Pokemon in the batch test")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case. The fastest one is reported")
+    parser.add_argument("--suite", action="store_true", help="Run the end-to-end suite against the stand-in API")
+    parser.add_argument("--fixtures", help="Recorded fixture directory for --suite. Made-up data is used if not given")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds the stand-in API waits before each response")
+    parser.add_argument("--out", help="Where to write the suite results as JSON. Printed if not given")
+    parser.add_argument("--record", metavar="DIR", help="Save live PokeAPI responses for the suite queries to DIR")
+    args = parser.parse_args()
+
+    if args.record:
+        n = record_fixtures(args.record)
+        print(f"Saved {n} responses to {args.record}")
+        return
+    if args.suite:
+        results = run_suite(args.fixtures, args.latency, args.repeat)
+        text = json.dumps(results, indent=2)
+        if args.out:
+            with open(args.out, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        return
+
+    np = project.import_numpy()
+    types = set(TYPE_CHART)
+    n_combos = len(project.get_type_combos(types))
+
+    print(f"Smeargle case: {len(types)} types, {n_combos} combos")
+    report("sets", n_combos, best_time(args.repeat, lambda: project.create_se_sets(project.get_type_combos(types), TYPE_CHART)))
+    report("bitmask", n_combos, best_time(args.repeat, lambda: project.get_best_combos(types, TYPE_CHART)))
+    report("numpy", n_combos, best_time(args.repeat, lambda: project.get_best_combos_numpy(types, TYPE_CHART)))
+    print("")
+
+    # Made-up learnsets of 5 to 14 move types each
+    rng = random.Random(0)
+    learnsets = [rng.sample(sorted(types), rng.randint(5, 14)) for _ in range(args.pokemon)]
+    matrix, attackers, _ = project.create_se_matrix(TYPE_CHART)
+    row_masks = project.pack_se_matrix(matrix)
+    rows = {t: i for i, t in enumerate(attackers)}
+    n_batch = sum(len(project.combo_index_template(len(l), 4)) for l in learnsets)
+
+    def score_batch():
+        # Stack every Pokemon's combos into one index array and score them in a single call,
+        # then take the best score in each Pokemon's slice
+        parts = [np.array([rows[t] for t in sorted(l)], dtype=np.intp)[project.combo_index_template(len(l), 4)] for l in learnsets]
+        _, lens = project.score_combos_numpy(row_masks, np.concatenate(parts))
+        offsets = np.cumsum([0] + [len(p) for p in parts[:-1]])
+        return np.maximum.reduceat(lens, offsets)
+
+    print(f"Batch case: {len(learnsets)} Pokemon, {n_batch} combos")
+    report("bitmask", n_batch, best_time(args.repeat, lambda: [project.get_best_combos(l, TYPE_CHART) for l in learnsets]))
+    report("numpy", n_batch, best_time(args.repeat, score_batch))
+
+
+# Queries the suite runs: (label, Pokemon, version)
+SUITE_QUERIES = [
+    ("normal", "treecko", "emerald"),
+    ("smeargle", "smeargle", "emerald"),
+    ("no_damaging_moves", "ditto", "emerald"),
+]
+
+# Type ids and the generation each type was added in, for made-up fixtures
+TYPE_IDS = {
+    "normal": 1, "fighting": 2, "flying": 3, "poison": 4, "ground": 5, "rock": 6, "bug": 7, "ghost": 8, "steel": 9,
+    "fire": 10, "water": 11, "grass": 12, "electric": 13, "psychic": 14, "ice": 15, "dragon": 16, "dark": 17, "fairy": 18,
+}
+TYPE_GENS = {"dark": 2, "steel": 2, "fairy": 6}
+
+# Each type's damage relations as PokeAPI gives them: (double, half, no) damage to, from gen 6 on.
+# Like the real data, they name types that older generations don't have
+DAMAGE_RELATIONS = {
+    "normal": ([], ["rock", "steel"], ["ghost"]),
+    "fighting": (["normal", "ice", "rock", "dark", "steel"], ["poison", "flying", "psychic", "bug", "fairy"], ["ghost"]),
+    "flying": (["grass", "fighting", "bug"], ["electric", "rock", "steel"], []),
+    "poison": (["grass", "fairy"], ["poison", "ground", "rock", "ghost"], ["steel"]),
+    "ground": (["fire", "electric", "poison", "rock", "steel"], ["grass", "bug"], ["flying"]),
+    "rock": (["fire", "ice", "flying", "bug"], ["fighting", "ground", "steel"], []),
+    "bug": (["grass", "psychic", "dark"], ["fire", "fighting", "poison", "flying", "ghost", "steel", "fairy"], []),
+    "ghost": (["psychic", "ghost"], ["dark"], ["normal"]),
+    "steel": (["ice", "rock", "fairy"], ["fire", "water", "electric", "steel"], []),
+    "fire": (["grass", "ice", "bug", "steel"], ["fire", "water", "rock", "dragon"], []),
+    "water": (["fire", "ground", "rock"], ["water", "grass", "dragon"], []),
+    "grass": (["water", "ground", "rock"], ["fire", "grass", "poison", "flying", "bug", "dragon", "steel"], []),
+    "electric": (["water", "flying"], ["electric", "grass", "dragon"], ["ground"]),
+    "psychic": (["fighting", "poison"], ["psychic", "steel"], ["dark"]),
+    "ice": (["grass", "ground", "flying", "dragon"], ["fire", "water", "ice", "steel"], []),
+    "dragon": (["dragon"], ["steel"], ["fairy"]),
+    "dark": (["psychic", "ghost"], ["fighting", "dark", "fairy"], []),
+    "fairy": (["fighting", "dragon", "dark"], ["fire", "poison", "steel"], []),
+}
+
+# PokeAPI's past_damage_relations: a type's relations up to and including a generation, for the ones that changed
+PAST_DAMAGE_RELATIONS = {
+    "poison": [("generation-i", (["grass", "bug"], ["poison", "ground", "rock", "ghost"], []))],
+    "bug": [("generation-i", (["grass", "poison", "psychic"], ["fire", "fighting", "flying", "ghost"], []))],
+    "ghost": [
+        ("generation-i", (["ghost"], [], ["normal", "psychic"])),
+        ("generation-v", (["psychic", "ghost"], ["dark", "steel"], ["normal"])),
+    ],
+    "ice": [("generation-i", (["grass", "ground", "flying", "dragon"], ["water", "ice"], []))],
+    "dark": [("generation-v", (["psychic", "ghost"], ["fighting", "dark", "steel"], []))],
+}
+
+# Every version group and the generation it's from, for made-up fixtures
+VERSION_GROUPS = {
+    "red-blue": 1, "yellow": 1, "gold-silver": 2, "crystal": 2, "ruby-sapphire": 3, "emerald": 3,
+    "firered-leafgreen": 3, "colosseum": 3, "xd": 3, "diamond-pearl": 4, "platinum": 4,
+    "heartgold-soulsilver": 4, "black-white": 5, "black-2-white-2": 5, "x-y": 6, "omega-ruby-alpha-sapphire": 6,
+    "sun-moon": 7, "ultra-sun-ultra-moon": 7, "lets-go-pikachu-lets-go-eevee": 7, "sword-shield": 8,
+    "the-isle-of-armor": 8, "the-crown-tundra": 8, "brilliant-diamond-and-shining-pearl": 8, "legends-arceus": 8,
+    "scarlet-violet": 9, "the-teal-mask": 9, "the-indigo-disk": 9,
+}
+
+
+'''
+Get the fixture file for an API URL. Fixtures mirror the API paths, e.g. .../api/v2/type/ghost/ is api/v2/type/ghost.json
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:param url: API URL or path
+:type url: str
+:return: Path to the fixture file
+:rtype: str
+'''
+def fixture_path(fixture_dir, url):
+    path = project.urlparse(url).path.strip("/")
+    return os.path.join(fixture_dir, *path.split("/")) + ".json"
+
+
+'''
+Save a fixture file
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:param url: API URL or path
+:type url: str
+:param data: JSON data
+:type data: dict
+'''
+def write_fixture(fixture_dir, url, data):
+    path = fixture_path(fixture_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+'''
+Start a local stand-in for PokeAPI that serves fixture files on a background thread
+The server counts requests and bytes per endpoint family (type, move, pokemon, ...) in server.stats
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:param latency: Milliseconds to wait before each response
+:type latency: float
+:return: The running server. Its API base URL is server.api_base
+:rtype: http.server.ThreadingHTTPServer
+'''
+def start_stand_in(fixture_dir, latency=0):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        # Keep connections alive like the real API, and send small responses right away
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency / 1000)
+            path = fixture_path(fixture_dir, self.path)
+            family = project.urlparse(self.path).path.strip("/").split("/")[2:3]
+            family = family[0] if family else ""
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                status = 200
+            except OSError:
+                # PokeAPI answers unknown names with a plain text 404
+                data, status = b"Not Found", 404
+
+            with server.lock:
+                counts = server.stats.setdefault(family, {"requests": 0, "bytes": 0})
+                counts["requests"] += 1
+                counts["bytes"] += len(data)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json" if status == 200 else "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            # Answers the GraphQL learnset query from the Pokemon and move fixtures
+            time.sleep(latency / 1000)
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            rows = graphql_learnset(fixture_dir, **body["variables"])
+            data = json.dumps({"data": {"pokemon_v2_pokemonmove": rows}}).encode()
+
+            with server.lock:
+                counts = server.stats.setdefault("graphql", {"requests": 0, "bytes": 0})
+                counts["requests"] += 1
+                counts["bytes"] += len(data)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.stats = {}
+    server.api_base = f"http://127.0.0.1:{server.server_address[1]}/api/v2"
+    server.graphql_url = f"http://127.0.0.1:{server.server_address[1]}/graphql/v1beta"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+'''
+Build the rows PokeAPI's GraphQL endpoint returns for LEARNSET_QUERY out of the REST fixtures
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:param pokemon: Name of Pokemon
+:type pokemon: str
+:param version: Game version
+:type version: str
+:return: One row per way the Pokemon learns a move in the version
+:rtype: list
+'''
+def graphql_learnset(fixture_dir, pokemon, version):
+    try:
+        with open(fixture_path(fixture_dir, f"{project.POKEAPI_URL}/pokemon/{pokemon}")) as f:
+            pkmn_json = json.load(f)
+    except OSError:
+        return []
+
+    rows = []
+    for move in pkmn_json["moves"]:
+        for vgd in move["version_group_details"]:
+            if vgd["version_group"]["name"] != version:
+                continue
+            with open(fixture_path(fixture_dir, move["move"]["url"])) as f:
+                move_json = json.load(f)
+            rows.append({
+                "level": vgd["level_learned_at"],
+                "move_id": int(move["move"]["url"].rstrip("/").split("/")[-1]),
+                "pokemon_v2_movelearnmethod": {"name": vgd["move_learn_method"]["name"]},
+                "pokemon_v2_move": {"name": move["move"]["name"], "power": move_json["power"], "pokemon_v2_type": {"name": move_json["type"]["name"]}},
+            })
+    return rows
+
+
+'''
+Lay fixtures out like PokeAPI's api-data dump: data/api/v2/RESOURCE/ID/index.json, plus a list of
+every item in data/api/v2/RESOURCE/index.json with URLs that start at /api/v2 like the dump's
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:param mirror_dir: Folder to write the mirror to
+:type mirror_dir: str
+:return: Number of files written
+:rtype: int
+'''
+def write_mirror(fixture_dir, mirror_dir):
+    source = os.path.join(fixture_dir, "api", "v2")
+    root = os.path.join(mirror_dir, "data", "api", "v2")
+    n_files = 0
+    for resource in sorted(os.listdir(source)):
+        folder = os.path.join(source, resource)
+        if not os.path.isdir(folder):
+            continue
+        results = []
+        for i, filename in enumerate(sorted(os.listdir(folder))):
+            name = filename[:-len(".json")]
+            with open(os.path.join(folder, filename)) as f:
+                data = json.load(f)
+            # The dump's folders are numbered, so named fixtures get a number
+            if name.isdigit():
+                ident = name
+            elif resource == "type":
+                ident = str(TYPE_IDS[name])
+            else:
+                ident = str(i + 1)
+            os.makedirs(os.path.join(root, resource, ident), exist_ok=True)
+            with open(os.path.join(root, resource, ident, "index.json"), "w") as f:
+                json.dump(data, f)
+            results.append({"name": data.get("name", name), "url": f"/api/v2/{resource}/{ident}/"})
+            n_files += 1
+        with open(os.path.join(root, resource, "index.json"), "w") as f:
+            json.dump({"count": len(results), "results": results}, f)
+        n_files += 1
+    return n_files
+
+
+'''
+Save live PokeAPI responses for everything the suite queries and the chart compiler ask for
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+:return: Number of responses saved
+:rtype: int
+'''
+def record_fixtures(fixture_dir):
+    saved = []
+    http_get = project.http_get
+
+    def recording_get(url):
+        response = http_get(url)
+        try:
+            write_fixture(fixture_dir, url, response.json())
+            saved.append(url)
+        except ValueError:
+            pass
+        return response
+
+    project.http_get = recording_get
+    project.configure_cache(enabled=False, memory_size=0)
+    try:
+        versions = project.get_valid_versions()
+        for _, pkmn_name, version in SUITE_QUERIES:
+            project.analyze_pokemon(pkmn_name, version, versions)
+        project.compile_type_chart(os.path.join(fixture_dir, "type_chart.json"))
+    finally:
+        project.http_get = http_get
+    return len(saved)
+
+
+'''
+Write made-up fixtures shaped like PokeAPI's for the suite queries, so the suite runs without recording first
+Types, generations and version groups use the real data, so compiling a chart from them gives the shipped
+type_chart.json. The normal Pokemon gets a large learnset with random move types
+
+:param fixture_dir: Fixture directory
+:type fixture_dir: str
+'''
+def write_synthetic_fixtures(fixture_dir):
+    base = project.POKEAPI_URL
+    rng = random.Random(0)
+    numerals = ["i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix"]
+    write_fixture(fixture_dir, f"{base}/version-group", {"results": [{"name": v} for v in VERSION_GROUPS]})
+    for v, gen in VERSION_GROUPS.items():
+        write_fixture(fixture_dir, f"{base}/version-group/{v}", {"generation": {"name": f"generation-{numerals[gen - 1]}"}})
+    # Learnsets only cover these
+    versions = ["red-blue", "emerald"]
+
+    write_fixture(fixture_dir, f"{base}/generation", {"results": [{"name": f"generation-{n}"} for n in numerals]})
+    for gen in range(1, len(numerals) + 1):
+        types = [{"name": t, "url": f"{base}/type/{i}/"} for t, i in TYPE_IDS.items() if TYPE_GENS.get(t, 1) == gen]
+        if gen == 3:
+            # Special types have ids over 10000 and are skipped by get_available_types
+            types.append({"name": "shadow", "url": f"{base}/type/10002/"})
+        write_fixture(fixture_dir, f"{base}/generation/{gen}", {"types": types})
+
+    def relations(double, half, no):
+        return {"double_damage_to": [{"name": d} for d in double], "half_damage_to": [{"name": d} for d in half], "no_damage_to": [{"name": d} for d in no]}
+
+    for t, current in DAMAGE_RELATIONS.items():
+        past = [{"generation": {"name": gen}, "damage_relations": relations(*old)} for gen, old in PAST_DAMAGE_RELATIONS.get(t, [])]
+        write_fixture(fixture_dir, f"{base}/type/{t}", {"name": t, "damage_relations": relations(*current), "past_damage_relations": past})
+
+    # Only use types that exist in emerald
+    move_types = sorted(t for t in TYPE_CHART if TYPE_GENS.get(t, 1) <= 3)
+    moves = []
+    for i in range(1, 151):
+        url = f"{base}/move/{i}/"
+        power = rng.choice([None, 40, 60, 80, 90, 120])
+        write_fixture(fixture_dir, url, {"name": f"move-{i}", "type": {"name": rng.choice(move_types)}, "power": power})
+        details = []
+        for v in versions:
+            if rng.random() < 0.7:
+                method = rng.choice(["level-up", "machine", "egg", "tutor"])
+                details.append({"version_group": {"name": v}, "move_learn_method": {"name": method}, "level_learned_at": rng.randint(1, 50) if method == "level-up" else 0})
+        moves.append({"move": {"name": f"move-{i}", "url": url}, "version_group_details": details})
+
+    def only_move(name, move_id):
+        url = f"{base}/move/{move_id}/"
+        write_fixture(fixture_dir, url, {"name": name, "type": {"name": "normal"}, "power": None})
+        details = [{"version_group": {"name": v}, "move_learn_method": {"name": "level-up"}, "level_learned_at": 1} for v in versions]
+        return [{"move": {"name": name, "url": url}, "version_group_details": details}]
+
+    write_fixture(fixture_dir, f"{base}/pokemon/treecko", {"name": "treecko", "moves": moves})
+    write_fixture(fixture_dir, f"{base}/pokemon/smeargle", {"name": "smeargle", "moves": only_move("sketch", 166)})
+    write_fixture(fixture_dir, f"{base}/pokemon/ditto", {"name": "ditto", "moves": only_move("transform", 144)})
+    # The Pokemon and species lists that names are checked against
+    names = ["treecko", "smeargle", "ditto"]
+    write_fixture(fixture_dir, f"{base}/pokemon", {"count": len(names), "results": [{"name": name, "url": f"{base}/pokemon/{name}/"} for name in names]})
+    write_fixture(fixture_dir, f"{base}/pokemon-species", {"count": len(names), "results": [{"name": name, "url": f"{base}/pokemon-species/{name}/"} for name in names]})
+    for name in names:
+        write_fixture(fixture_dir, f"{base}/pokemon-species/{name}", {"name": name, "varieties": [{"is_default": True, "pokemon": {"name": name}}]})
+
+
+'''
+Run main() in this process with the given arguments and capture what it prints
+
+:param argv: Command line arguments
+:type argv: list
+:return: Seconds taken
+:rtype: float
+'''
+def time_main(argv):
+    old_argv = sys.argv
+    sys.argv = ["project.py"] + argv
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            project.main()
+            return time.perf_counter() - start
+    finally:
+        sys.argv = old_argv
+
+
+'''
+Run the end-to-end suite
+
+:param fixture_dir: Recorded fixture directory, or None for made-up fixtures
+:type fixture_dir: str
+:param latency: Milliseconds the stand-in API waits before each response
+:type latency: float
+:param repeat: Runs per timing. The fastest one is reported
+:type repeat: int
+:return: Results for each query, ready to save as JSON
+:rtype: dict
+'''
+def run_suite(fixture_dir=None, latency=0, repeat=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = "recorded" if fixture_dir else "synthetic"
+        if fixture_dir is None:
+            fixture_dir = os.path.join(tmp, "fixtures")
+            write_synthetic_fixtures(fixture_dir)
+        server = start_stand_in(fixture_dir, latency)
+
+        saved = (project.API_BASE, project.TYPE_CHART_PATH, project.CACHE_PATH, project.CACHE_ENABLED, project.OFFLINE, project.MEMORY_CACHE_SIZE, project.MIRROR_DIR)
+        project.API_BASE = server.api_base
+        project.configure_cache(path=os.path.join(tmp, "cache.sqlite3"), offline=False)
+        try:
+            # Build a chart from the stand-in for the runs that use one
+            chart_path = os.path.join(tmp, "type_chart.json")
+            project.TYPE_CHART_PATH = chart_path
+            project.configure_cache(enabled=False)
+            project.clear_memory_caches()
+            project.compile_type_chart(chart_path)
+            mirror_dir = os.path.join(tmp, "mirror")
+            write_mirror(fixture_dir, mirror_dir)
+
+            queries = {}
+            for label, pkmn_name, version in SUITE_QUERIES:
+                queries[label] = run_suite_query(server, pkmn_name, version, chart_path, repeat, mirror_dir)
+        finally:
+            server.shutdown()
+            server.server_close()
+            project.API_BASE, project.TYPE_CHART_PATH = saved[0], saved[1]
+            project.configure_cache(path=saved[2], enabled=saved[3], offline=saved[4], memory_size=saved[5])
+            project.configure_mirror(saved[6])
+            project.clear_memory_caches()
+
+    return {
+        "suite": 1,
+        "fixtures": source,
+        "latency_ms": latency,
+        "python": platform.python_version(),
+        "queries": queries,
+    }
+
+
+'''
+Measure one query of the suite
+
+:param server: Running stand-in server
+:type server: http.server.ThreadingHTTPServer
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:param version: Game version
+:type version: str
+:param chart_path: Precompiled chart built from the stand-in
+:type chart_path: str
+:param repeat: Runs per timing. The fastest one is reported
+:type repeat: int
+:param mirror_dir: api-data mirror of the fixtures
+:type mirror_dir: str
+:return: Timings and request counts for the query
+:rtype: dict
+'''
+def run_suite_query(server, pkmn_name, version, chart_path, repeat, mirror_dir):
+    argv = ["-p", pkmn_name, "-v", version]
+    missing_chart = chart_path + ".missing"
+    result = {"pokemon": pkmn_name, "version": version}
+
+    # End to end with nothing cached: no response cache and no precompiled chart, like the original program
+    def cold_run(path):
+        project.TYPE_CHART_PATH = path
+        project.clear_memory_caches()
+        server.stats.clear()
+        return time_main(argv + ["--no-cache"])
+
+    for name, path in [("cold", missing_chart), ("cold_with_chart", chart_path)]:
+        seconds = min(cold_run(path) for _ in range(repeat))
+        result[name] = {
+            "seconds": seconds,
+            "requests": sum(c["requests"] for c in server.stats.values()),
+            "bytes": sum(c["bytes"] for c in server.stats.values()),
+            # Copy the counters too, the server keeps adding to them during the next runs
+            "by_endpoint": {family: dict(counts) for family, counts in sorted(server.stats.items())},
+        }
+
+    # End to end with a filled response cache and the chart, after clearing what's kept in memory
+    project.TYPE_CHART_PATH = chart_path
+    project.clear_memory_caches()
+    time_main(argv)
+    times = []
+    for _ in range(repeat):
+        project.clear_memory_caches()
+        server.stats.clear()
+        times.append(time_main(argv))
+    result["cached"] = {"seconds": min(times), "requests": sum(c["requests"] for c in server.stats.values())}
+
+    # classify_moves throughput with every move fetched from the stand-in
+    project.configure_cache(enabled=False)
+    pkmn_json = project.get_pkmn_json(pkmn_name)
+    n_moves = len(project.build_learnset_index(pkmn_json)["versions"].get(version, []))
+    times = []
+    for _ in range(repeat):
+        project.clear_memory_caches()
+        start = time.perf_counter()
+        types_to_moves = project.classify_moves(pkmn_json, version)
+        times.append(time.perf_counter() - start)
+    result["classify_moves"] = {"moves": n_moves, "seconds": min(times), "moves_per_second": n_moves / min(times) if min(times) else None}
+
+    # Coverage engine speed on this query's move types
+    gen = project.get_version_gen(version)
+    if pkmn_name == "smeargle":
+        move_types, _ = project.get_gen_chart(gen)
+    else:
+        move_types = set(types_to_moves)
+    if move_types:
+        types_to_se = project.get_types_to_se(move_types, gen)
+        n_combos = len(project.get_type_combos(move_types))
+        seconds = best_time(repeat, lambda: project.get_best_combos(move_types, types_to_se))
+        result["coverage"] = {"types": len(move_types), "combos": n_combos, "seconds": seconds, "combos_per_second": n_combos / seconds}
+    else:
+        result["coverage"] = {"types": 0, "combos": 0, "seconds": 0, "combos_per_second": None}
+    project.configure_cache(enabled=True)
+
+    # End to end from the api-data mirror with no response cache and no precompiled chart
+    project.TYPE_CHART_PATH = missing_chart
+    times = []
+    for _ in range(repeat):
+        project.clear_memory_caches()
+        server.stats.clear()
+        times.append(time_main(argv + ["--no-cache", "--mirror", mirror_dir]))
+    result["mirror"] = {"seconds": min(times), "requests": sum(c["requests"] for c in server.stats.values())}
+    project.configure_mirror(None)
+    project.configure_cache(enabled=True)
+    return result
+
+
+'''
+Run a function several times and get the fastest run
+
+:param repeat: Number of runs
+:type repeat: int
+:param func: Function to time
+:type func: function
+:return: Fastest run time in seconds
+:rtype: float
+'''
+def best_time(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+'''
+Print one benchmark result
+
+:param name: Engine name
+:type name: str
+:param n_combos: Number of combos scored
+:type n_combos: int
+:param seconds: Time taken
+:type seconds: float
+'''
+def report(name, n_combos, seconds):
+    print(f"  {name:<8} {seconds * 1000:9.2f} ms  {n_combos / seconds:14,.0f} combos/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,25 @@
-import requests
 import argparse
+import atexit
+import contextlib
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import sqlite3
+import struct
 import sys
-import roman
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
 from itertools import combinations
-from tabulate import tabulate
+from math import comb
+from urllib.parse import urlparse
+
+# requests, roman, tabulate, numpy and concurrent.futures are imported inside the functions
+# that use them, so a cached query or -h doesn't pay for them at startup
 
 '''
 Prinyavong Phongsavan
@@ -17,111 +33,665 @@ This is a command-line tool that takes in a Pokemon name and game version and pr
     Which types are not covered super-effectively
 '''
 
+# Local response cache settings. PokeAPI data almost never changes, so responses are kept on disk
+# and reused until they are older than CACHE_TTL seconds. The least recently used entries are
+# dropped once there are more than CACHE_MAX_ENTRIES.
+CACHE_PATH = os.environ.get("PKMN_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pkmn-type-coverage", "cache.sqlite3"))
+CACHE_TTL = 30 * 24 * 60 * 60
+CACHE_MAX_ENTRIES = 20000
+CACHE_ENABLED = True
+OFFLINE = False
+CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0, "memory_hits": 0}
+
+# Recently used responses are also kept in memory, up to MEMORY_CACHE_SIZE of them, so a
+# long-running server doesn't have to read and parse them from disk on every query. One Pokemon with a
+# big learnset fetches a few hundred moves, so there's room for the moves of a few queries at once
+MEMORY_CACHE_SIZE = 1000
+_memory_cache = OrderedDict()
+_cache_db = None
+_cache_lock = threading.Lock()
+
+# Cache hits only note when each response was used. The notes are written together with the next
+# cache_put, or at exit, so reading from the cache never waits on a disk write
+_cache_used = {}
+CACHE_USED_BATCH = 500
+
+# Where API requests go. URLs in the code and in API data always start with POKEAPI_URL, and
+# http_get swaps that for API_BASE, so the program can be pointed at a local stand-in server
+POKEAPI_URL = "https://pokeapi.co/api/v2"
+API_BASE = os.environ.get("PKMN_API_BASE", POKEAPI_URL)
+
+# Local copy of PokeAPI's api-data dump, the JSON file tree that mirrors the /api/v2/... URLs.
+# When it's set, url_to_json reads files from it instead of making requests. The dump's folders are
+# numbered, so names are looked up in each resource's list, which is only read the first time it's needed
+MIRROR_DIR = os.environ.get("PKMN_MIRROR")
+MIRROR_RESOURCES = ["version-group", "generation", "type", "pokemon", "pokemon-species", "move"]
+_mirror_ids = {}
+_mirror_lock = threading.Lock()
+
+# Sorted Pokemon and form names, and each name's Pokedex position, for checking names without the API
+_name_index = None
+_name_lock = threading.Lock()
+
+# Where learnsets come from. "rest" reads the Pokemon's JSON and then fetches every move it hasn't seen
+# to get the move's type and power. "graphql" gets a version's whole learnset with move types and
+# power from PokeAPI's GraphQL endpoint in one request
+LEARNSET_BACKEND = os.environ.get("PKMN_BACKEND", "rest")
+GRAPHQL_URL = os.environ.get("PKMN_GRAPHQL_URL", "https://beta.pokeapi.co/graphql/v1beta")
+LEARNSET_QUERY = '''
+query learnset($pokemon: String!, $version: String!) {
+  pokemon_v2_pokemonmove(
+    where: {pokemon_v2_pokemon: {name: {_eq: $pokemon}}, pokemon_v2_versiongroup: {name: {_eq: $version}}}
+    order_by: {id: asc}
+  ) {
+    level
+    move_id
+    pokemon_v2_movelearnmethod { name }
+    pokemon_v2_move { name power pokemon_v2_type { name } }
+  }
+}
+'''
+
+# HTTP settings. One shared session keeps connections alive between requests, and move details
+# are fetched in parallel with at most HOST_CONCURRENCY requests in flight to any one host.
+MAX_WORKERS = 8
+HOST_CONCURRENCY = 8
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+_session = None
+_host_limits = {}
+_http_lock = threading.Lock()
+
+# Combo index arrays for the numpy engine, keyed by (number of types, combo size)
+_combo_templates = {}
+
+# Profiling data for --profile, or None when profiling is off. Stages are timed with profile_stage
+# and every HTTP request is recorded by http_get. When it's None, both only cost an "is None" check
+PROFILE = None
+_profile_lock = threading.Lock()
+_no_profile = contextlib.nullcontext()
+
+# A damaging move a Pokemon learns. It's a tuple, so tabulate and json treat it like the
+# [name, level, method] lists it replaced, but it's smaller and the fields have names
+Move = namedtuple("Move", ["name", "level", "method"])
+
+# Learnset indexes built by get_learnset_index, keyed by Pokemon name. The least recently used
+# are dropped once there are more than LEARNSET_CACHE_SIZE
+LEARNSET_CACHE_SIZE = 256
+_learnset_indexes = OrderedDict()
+_learnset_lock = threading.Lock()
+
+# Lookups shared by every job in a batch run: version -> generation number, and
+# generation number -> (types in the generation, type to super effective set for those types)
+_version_gens = {}
+_gen_charts = {}
+_gen_multipliers = {}
+_gen_masks = {}
+_batch_lock = threading.Lock()
+
+# Precompiled type chart. It holds the version group -> generation map and each generation's types and
+# super effective sets, so coverage doesn't need any type or generation API calls.
+# Rebuild it with 'project.py --compile-chart' when PokeAPI changes.
+TYPE_CHART_PATH = os.environ.get("PKMN_TYPE_CHART", os.path.join(os.path.dirname(os.path.abspath(__file__)), "type_chart.json"))
+TYPE_CHART_FORMAT = 2
+_type_chart = None
+
+# Precomputed coverage index built with --build-index. The file is a header, a table of type names,
+# one fixed-width record per (Pokemon, version group) and a sorted table of "pokemon/version" keys
+# where key i belongs to record i. Types are bits in the order of the type table.
+# A record holds the generation, how many combos tie for best, bitmasks of the Pokemon's move types
+# and of the types in the generation, then up to INDEX_OPTIONS (combo types, covered types) bitmask pairs
+INDEX_MAGIC = b"PKMNIDX1"
+INDEX_FORMAT = 1
+INDEX_OPTIONS = 8
+INDEX_KEY_WIDTH = 64
+INDEX_TYPE_WIDTH = 16
+INDEX_HEADER = struct.Struct("<8sHHHHII")
+INDEX_RECORD = struct.Struct("<BBHII" + "II" * INDEX_OPTIONS)
+_indexes = {}
+_index_lock = threading.Lock()
+
 
 def main():
 
-    # Instantiate list of versions from PokeAPI
-    versions = get_valid_versions()
+    # Flags that change how or whether the version list below is fetched are read first
+    early_parser = argparse.ArgumentParser(add_help=False)
+    early_parser.add_argument("--offline", action="store_true", help="Only use cached API responses, never the network")
+    early_parser.add_argument("--no-cache", action="store_true", help="Don't read or write the local response cache")
+    early_parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL, help="Seconds before a cached response is refetched")
+    early_parser.add_argument("--cache-size", type=int, default=CACHE_MAX_ENTRIES, help="Max number of cached responses to keep")
+    early_parser.add_argument("--mirror", metavar="DIR", default=MIRROR_DIR, help="Read API data from a local copy of PokeAPI's api-data dump instead of the network")
+    early_parser.add_argument("--import-mirror", metavar="ARCHIVE", help="Unpack the parts of an api-data zip or tar archive this program uses into the --mirror folder, then check it")
+    early_parser.add_argument("--verify-mirror", action="store_true", help="Check that the --mirror folder has everything this program uses")
+    early_parser.add_argument("--compile-chart", action="store_true", help="Fetch the type chart for every generation from PokeAPI and save it to type_chart.json")
+    early_args, _ = early_parser.parse_known_args()
+    configure_cache(ttl=early_args.cache_ttl, max_entries=early_args.cache_size, offline=early_args.offline, enabled=not early_args.no_cache)
+    configure_mirror(early_args.mirror)
+
+    if early_args.import_mirror or early_args.verify_mirror:
+        if not early_args.mirror:
+            sys.exit("--import-mirror and --verify-mirror need --mirror DIR")
+        if early_args.import_mirror:
+            n_files = import_mirror(early_args.import_mirror, early_args.mirror)
+            print(f"Unpacked {n_files} files to {early_args.mirror}")
+        missing = verify_mirror()
+        for resource in MIRROR_RESOURCES:
+            print(f"{resource}: {'ok' if not missing[resource] else str(len(missing[resource])) + ' missing, like ' + missing[resource][0]}")
+        if any(missing.values()):
+            sys.exit("The mirror is incomplete")
+        return
+
+    if early_args.compile_chart:
+        chart = compile_type_chart()
+        print(f"Saved the type chart for {len(chart['generations'])} generations to {TYPE_CHART_PATH}")
+        return
+
+    # Only fetch the full list of versions when it's going to be shown in the help message.
+    # Otherwise the version is checked against the precompiled chart or cache after parsing
+    if "-h" in sys.argv or "--help" in sys.argv:
+        version_help = f"Game version. Valid args: {get_valid_versions()}"
+    else:
+        version_help = "Game version. Use -h to list valid versions"
 
     # Set up command line arguments
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-v", help=f"Game version. Valid args: {versions}")
+    parser = argparse.ArgumentParser(parents=[early_parser])
+    parser.add_argument("-v", help=version_help)
     parser.add_argument("-p", help="Name of Pokemon") 
+    parser.add_argument("--engine", choices=["bitmask", "numpy", "search"], default="bitmask", help="How to find the best type combos. numpy needs NumPy installed, search uses branch and bound")
+    parser.add_argument("-k", type=int, default=4, help="Number of move types in a combo")
+    parser.add_argument("--team", metavar="NAMES", help="Comma separated list of up to 6 Pokemon. Picks move types for each one so the team covers the most types together")
+    parser.add_argument("--top", type=int, metavar="N", help="Show the N best combos in rank order, not only the ones tied for the most coverage. Ties are broken by number of learnable moves")
+    parser.add_argument("--lock", metavar="TYPES", help="Comma separated move types every combo has to include, e.g. --lock fire,water to see what's best next to moves you're keeping")
+    parser.add_argument("--batch", metavar="FILE", help="Read 'pokemon version' lines from FILE ('-' for stdin) and write one JSON result per line")
+    parser.add_argument("--workers", type=int, default=4, help="Number of Pokemon analyzed at the same time in batch mode")
+    parser.add_argument("--dual", action="store_true", help="Score coverage against every single and dual type instead of single types only")
+    parser.add_argument("--serve", action="store_true", help="Run a local HTTP server that answers GET /coverage?pokemon=NAME&version=VERSION with JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the server listens on")
+    parser.add_argument("--port", type=int, default=8765, help="Port the server listens on")
+    parser.add_argument("--build-index", metavar="FILE", help="Work out the best coverage of every Pokemon in every version group and save it to FILE. Uses --workers processes and picks up where it left off if stopped")
+    parser.add_argument("--index", metavar="FILE", help="Answer -p and -v from an index made with --build-index instead of the API")
+    parser.add_argument("--backend", choices=["rest", "graphql"], default=LEARNSET_BACKEND, help="Where learnsets come from. graphql gets a whole learnset with move types in one request")
+    parser.add_argument("--format", choices=["table", "json", "jsonl", "csv"], default="table", help="Output format for a single query. json, jsonl and csv are for other programs")
+    parser.add_argument("--memory-cache", type=int, default=MEMORY_CACHE_SIZE, help="Max number of API responses kept in memory")
+    parser.add_argument("--profile", metavar="FILE", help="Save per-stage timings and API call stats to FILE as a Chrome trace (JSON)")
     args = parser.parse_args()
 
+    configure_cache(memory_size=args.memory_cache)
+    configure_backend(args.backend)
+
+    if args.profile:
+        start_profile()
+        try:
+            run(args, parser)
+        finally:
+            write_profile(args.profile)
+    else:
+        run(args, parser)
+
+'''
+Run the mode picked on the command line: server, batch, or a single Pokemon printed as tables
+
+:param args: Parsed command line arguments
+:type args: argparse.Namespace
+:param parser: The argument parser, for reporting bad arguments
+:type parser: argparse.ArgumentParser
+'''
+def run(args, parser):
+    if args.k < 1:
+        parser.error("-k must be at least 1")
+    if args.top is not None and args.top < 1:
+        parser.error("--top must be at least 1")
+    lock = parse_lock(args.lock or "")
+    if len(lock) > args.k:
+        parser.error("--lock can't have more types than -k")
+    if lock and args.top:
+        parser.error("--lock and --top can't be used together")
+
+    if args.serve:
+        server = make_server(args.host, args.port)
+        print(f"Serving coverage on http://{server.server_address[0]}:{server.server_address[1]}/coverage")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        return
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, engine=args.engine, workers=args.workers, dual=args.dual, size=args.k, top=args.top, lock=lock)
+        else:
+            with open(args.batch) as f:
+                run_batch(f, engine=args.engine, workers=args.workers, dual=args.dual, size=args.k, top=args.top, lock=lock)
+        return
+
+    if args.build_index:
+        n_records = build_index(args.build_index, args.workers)
+        print(f"Wrote {n_records} records to {args.build_index}")
+        return
+
+    if args.index:
+        if args.v is None or args.p is None:
+            parser.error("-p and -v are required with --index")
+        print_index_result(args.index, args.p, args.v)
+        return
+
+    if args.team:
+        if args.v is None:
+            parser.error("-v is required with --team")
+        team = [name.strip() for name in args.team.split(",") if name.strip()]
+        if not 1 <= len(team) <= 6:
+            parser.error("--team takes 1 to 6 Pokemon")
+        print_team(team, args.v, args.dual, args.k)
+        return
+
+    if args.v is None or args.p is None:
+        parser.error("-p and -v are required unless --batch or --team is used")
+
     # Set cli args to variables
     GAME_VERSION = args.v
     PKMN_NAME = args.p.lower()
 
-    # Headers for the tabulate tables of moves we print later
-    HEADERS = ["Name", "Level Learned", "Method"]
+    # Progress messages are only for people reading the tables, they'd get in the way of json and csv
+    def progress(message):
+        if args.format == "table":
+            print(message)
 
-    # Check if version is valid and Pokemon is valid and available in given game
+    # Check if version is valid, then work out the coverage the same way batch and server mode do
     try:
-        if valid_version(GAME_VERSION, versions):
-            GEN = get_gen_num(get_generation(GAME_VERSION))
+        versions = get_versions([GAME_VERSION])
+        valid_version(GAME_VERSION, versions)
+    except ValueError:
+        # Input game version not found
+        sys.exit(f"'{GAME_VERSION}' is not a valid game version. Please use 'project.py -h' to view valid options")
+
+    result = analyze_pokemon(PKMN_NAME, GAME_VERSION, versions, args.engine, args.dual, args.k, args.top, lock, progress)
+    if "error" in result:
+        sys.exit(result["error"])
+    progress("")
+
+    with profile_stage("render"):
+        RENDERERS[args.format](result, sys.stdout)
+
+'''
+Read a comma separated list of types, like from --lock
+
+:param text: Comma separated types, e.g. "fire, Water"
+:type text: str
+:return: Set of lowercase type names
+:rtype: set
+'''
+def parse_lock(text):
+    return {t.strip().lower() for t in text.split(",") if t.strip()}
+
+'''
+Go through the best combos one at a time as coverage options
+
+:param combos: Type combos in the order they should be shown
+:type combos: list
+:param combos_to_se: Combo to the set of types it covers
+:type combos_to_se: dict
+:param defenders: Every type that could be covered
+:type defenders: set
+:return: Yields dicts with the sorted "types", "covered" and "not_covered" of each combo
+:rtype: generator
+'''
+def iter_options(combos, combos_to_se, defenders):
+    for c in combos:
+        yield {
+            "types": sorted(c),
+            "covered": sorted(combos_to_se[c]),
+            "not_covered": sorted(defenders - combos_to_se[c]),
+        }
+
+'''
+Go through a Pokemon's moves type by type in ABC order, and by learn method within a type
+
+:param types_to_moves_dict: Type to a list of Move records, from classify_moves
+:type types_to_moves_dict: dict
+:return: Yields (type, Move) pairs
+:rtype: generator
+'''
+def iter_moves(types_to_moves_dict):
+    for t in sorted(types_to_moves_dict):
+        for move in sorted(types_to_moves_dict[t], key=lambda m: m.method):
+            yield t, move
 
-            print("Getting list of available types in given version...")
-            TYPES_IN_GEN = get_available_types(GEN)
+'''
+Print a query result as the tables people read. This is the default --format
 
-            print("Getting Pokemon information...")
-            
-            pkmn_json = get_pkmn_json(PKMN_NAME)
+:param result: Result from analyze_pokemon: Pokemon, version, generation, "moves" (type to Move records, or None for Smeargle),
+    "move_types", "dual" and "options"
+:type result: dict
+:param out: Where to write
+:type out: file
+'''
+def render_table(result, out):
+    # Headers for the tabulate tables of moves
+    HEADERS = ["Name", "Level Learned", "Method"]
+    name = result["pokemon"]
+
+    # Print out a small table with the Pokemon name and input version
+    pkmn_table = ["Pokemon", name.title()], ["Game", result["version"].upper()]
+    print(tabulate(pkmn_table, tablefmt="rounded_grid"), file=out)
+    print("", file=out)
+
+    if not result["move_types"]:
+        print(f"{name.title()} cannot learn any damaging moves.", file=out)
+        return
+
+    # Print out tables of moves if the input Pokemon isn't Smeargle
+    if result["moves"] is not None:
+        print(f"ALL DAMAGING MOVE TYPES FOR {name.upper()}: ", file=out)
+        print(f"{result['move_types']}", file=out)
+        print("", file=out)
+
+        print(f"DAMAGING MOVES LEARNED BY {name.upper()}: ", file=out)
+        print("", file=out)
+
+        # Print out each type and the corresponding moves in ABC order
+        for k in sorted(result["moves"]):
+            print(k.upper(), file=out)
+            moves_sorted_by_method = sorted(result["moves"][k], key=lambda m: m.method)
+            print(tabulate(moves_sorted_by_method, HEADERS, tablefmt="simple_grid"), file=out)
+            print("", file=out)
+    else:
+        # Special output for Smeargle
+        print("Smeargle can learn all move types by using its special move Sketch.", file=out)
+        print("Use Sketch to copy any of these type combos: ", file=out)
+        print("", file=out)
+
+    # Print out the combos with the most coverage, then the types they cover, then the ones they don't
+    for i, option in enumerate(result["options"]):
+        print(f"Option {i + 1}", file=out)
+        types_str = ', '.join(option["types"])
+        if result["dual"]:
+            # Listing every covered dual type would be too long, so just give the count
+            covered_str = f"of {len(option['covered']) + len(option['not_covered'])} single and dual types"
+        else:
+            covered_str = ', '.join(option["covered"])
+        not_covered_str = ', '.join(option["not_covered"])
+        table = [["Types", "", types_str], ["Covered", len(option["covered"]), covered_str], ["Not covered", len(option["not_covered"]), not_covered_str]]
+        print(tabulate(table, tablefmt="double_grid"), file=out)
 
-            print("Getting moves information...")
+'''
+Write a query result as one JSON document, in the same shape as batch mode's results.
+It's written piece by piece as moves and options come in instead of being built up first
 
-            # Smeargle is a special Pokemon that can copy almost all moves
-            if PKMN_NAME == "smeargle":
-                move_types = set(TYPES_IN_GEN)
+:param result: Query result, see render_table
+:type result: dict
+:param out: Where to write
+:type out: file
+'''
+def render_json(result, out):
+    out.write("{" + f'"pokemon": {json.dumps(result["pokemon"])}, "version": {json.dumps(result["version"])}, "generation": {result["generation"]}, "moves": ')
+    if result["moves"] is None:
+        out.write("null")
+    else:
+        out.write("{")
+        previous = None
+        for t, move in iter_moves(result["moves"]):
+            if t != previous:
+                out.write(("], " if previous is not None else "") + json.dumps(t) + ": [")
             else:
-                types_to_moves_dict = classify_moves(pkmn_json, GAME_VERSION)
-
-                # In the case of no damaging moves found (Ditto, Wobbufett, etc.) return early
-                if types_to_moves_dict == {}:
-                    print("")
-                    pkmn_table = ["Pokemon", PKMN_NAME.title()], ["Game", GAME_VERSION.upper()]
-                    print(tabulate(pkmn_table, tablefmt="rounded_grid"))
-                    print("")
-                    print(f"{PKMN_NAME.title()} cannot learn any damaging moves.")
-                    return
-
-                move_types = set(types_to_moves_dict.keys())
-
-            print("Checking move types...")
-            print("")
-
-            # Print out a small table with the Pokemon name and input version
-            pkmn_table = ["Pokemon", PKMN_NAME.title()], ["Game", GAME_VERSION.upper()]
-            print(tabulate(pkmn_table, tablefmt="rounded_grid"))
-            print("")
-        
-            # Print out tables of moves if the input Pokemon isn't Smeargle
-            if PKMN_NAME != "smeargle":
-                print(f"ALL DAMAGING MOVE TYPES FOR {PKMN_NAME.upper()}: ")
-                print(f"{sorted(list(move_types))}")
-                print("")
-
-                print(f"DAMAGING MOVES LEARNED BY {PKMN_NAME.upper()}: ")
-                print("")
-
-                # Print out each type and the corresponding moves in ABC order
-                types_alphabatized = sorted(list(types_to_moves_dict.keys()))
-                for k in types_alphabatized:
-                    print(k.upper())
-                    moves_sorted_by_method = sorted(types_to_moves_dict[k], key = lambda x: x[2])
-                    print(tabulate(moves_sorted_by_method, HEADERS, tablefmt="simple_grid"))
-                    print("")
-
-            # Get all possible type combos
-            types_to_se = create_type_to_se_dict(move_types, GEN)
-            combos = get_type_combos(move_types)
-
-            # Check what each type combo covers super-effectively, then find the ones with most coverage
-            len_to_combos, combos_to_se = create_se_sets(combos, types_to_se)
-            max_combos = len_to_combos[max(len_to_combos)]
-
-            # Special output for Smeargle
-            if PKMN_NAME == "smeargle":
-                print("Smeargle can learn all move types by using its special move Sketch.")
-                print("Use Sketch to copy any of these type combos: ")
-                print("")
-
-            # Print out the combos with the most coverage, then the types they cover, then the ones they don't
-            for i, c in enumerate(max_combos):
-                print(f"Option {i + 1}")
-                not_covered = TYPES_IN_GEN - combos_to_se[c]
-                types_str = ', '.join(sorted(list(c)))
-                covered_str = ', '.join(sorted(list(combos_to_se[c])))
-                not_covered_str = ', '.join(sorted(list(not_covered)))
-                table = [["Types", "", types_str], ["Covered", len(combos_to_se[c]), covered_str], ["Not covered", len(not_covered), not_covered_str]]
-                print(tabulate(table, tablefmt="double_grid"))
+                out.write(", ")
+            out.write(json.dumps(move))
+            previous = t
+        out.write("]}" if previous is not None else "}")
+    out.write(f', "move_types": {json.dumps(result["move_types"])}, "options": [')
+    for i, option in enumerate(result["options"]):
+        out.write((", " if i else "") + json.dumps(option))
+    out.write("]}\n")
+
+'''
+Write a query result as JSON lines: one "pokemon" record, then one "move" record per move,
+then one "option" record per combo, each written as soon as it's ready
+
+:param result: Query result, see render_table
+:type result: dict
+:param out: Where to write
+:type out: file
+'''
+def render_jsonl(result, out):
+    out.write(json.dumps({"record": "pokemon", "pokemon": result["pokemon"], "version": result["version"], "generation": result["generation"], "move_types": result["move_types"]}) + "\n")
+    if result["moves"] is not None:
+        for t, move in iter_moves(result["moves"]):
+            out.write(json.dumps({"record": "move", "type": t, "name": move.name, "level": move.level, "method": move.method}) + "\n")
+    for i, option in enumerate(result["options"]):
+        out.write(json.dumps({"record": "option", "rank": i + 1, **option}) + "\n")
+
+'''
+Write a query result as CSV with one row per move and one row per option. Every row has the Pokemon and version,
+and type lists are separated by spaces
+
+:param result: Query result, see render_table
+:type result: dict
+:param out: Where to write
+:type out: file
+'''
+def render_csv(result, out):
+    import csv
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["record", "pokemon", "version", "type", "name", "level", "method", "rank", "types", "covered", "not_covered"])
+    pkmn = [result["pokemon"], result["version"]]
+    if result["moves"] is not None:
+        for t, move in iter_moves(result["moves"]):
+            writer.writerow(["move", *pkmn, t, move.name, move.level, move.method, "", "", "", ""])
+    for i, option in enumerate(result["options"]):
+        writer.writerow(["option", *pkmn, "", "", "", "", i + 1, " ".join(option["types"]), " ".join(option["covered"]), " ".join(option["not_covered"])])
+
+# Output formats for a single query. Each renderer takes the result and the stream to write to
+RENDERERS = {"table": render_table, "json": render_json, "jsonl": render_jsonl, "csv": render_csv}
 
+'''
+Print the best move types for each member of a team and what the team covers together
+
+:param team: Names of up to 6 Pokemon
+:type team: list
+:param version: Game version
+:type version: str
+:param dual: If True, score coverage against every single and dual type instead of single types
+:type dual: bool
+:param size: Number of types in each member's combo
+:type size: int
+'''
+def print_team(team, version, dual=False, size=4):
+    print("Getting team information...")
+    result = analyze_team(team, version, get_versions([version]), dual, size)
+    if "error" in result:
+        sys.exit(f"'{version}' is not a valid game version. Please use 'project.py -h' to view valid options")
+
+    with profile_stage("render"):
+        print("")
+        print(tabulate([["Game", version.upper()]], tablefmt="rounded_grid"))
+        print("")
+        for member in result["members"]:
+            if member["types"]:
+                types_str = ', '.join(member["types"])
+            else:
+                types_str = "No damaging moves"
+            table = [["Pokemon", "", member["pokemon"].title()], ["Types", "", types_str], ["Covered", len(member["covered"]), ', '.join(member["covered"])]]
+            print(tabulate(table, tablefmt="double_grid"))
+
+        print("")
+        print("TEAM COVERAGE: ")
+        if dual:
+            # Listing every covered dual type would be too long, so just give the counts
+            covered_str = "single and dual types"
+            twice_str = "single and dual types"
         else:
-            # Input Pokemon name not found
-            sys.exit(f"Pokemon '{PKMN_NAME.title()}' is not available in version '{GAME_VERSION}'")
-    except ValueError:
-        # Input game version not found
-        sys.exit(f"'{GAME_VERSION}' is not a valid game version. Please use 'project.py -h' to view valid options")
+            covered_str = ', '.join(result["covered"])
+            twice_str = ', '.join(result["covered_twice"])
+        table = [["Covered", len(result["covered"]), covered_str], ["Covered twice", len(result["covered_twice"]), twice_str], ["Not covered", len(result["not_covered"]), ', '.join(result["not_covered"])]]
+        print(tabulate(table, tablefmt="double_grid"))
+
+'''
+Print a Pokemon's best coverage from a precomputed index
+
+:param path: Index file path
+:type path: str
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:param version: Game version
+:type version: str
+'''
+def print_index_result(path, pkmn_name, version):
+    with profile_stage("lookup_index"):
+        result = lookup_index(path, pkmn_name, version)
+    if result is None:
+        sys.exit(f"Pokemon '{pkmn_name.title()}' in version '{version}' is not in the index")
+
+    with profile_stage("render"):
+        pkmn_table = ["Pokemon", result["pokemon"].title()], ["Game", version.upper()]
+        print(tabulate(pkmn_table, tablefmt="rounded_grid"))
+        print("")
+        if not result["options"]:
+            print(f"{result['pokemon'].title()} cannot learn any damaging moves.")
+            return
+
+        print(f"ALL DAMAGING MOVE TYPES FOR {result['pokemon'].upper()}: ")
+        print(f"{result['move_types']}")
+        print("")
+        for i, option in enumerate(result["options"]):
+            print(f"Option {i + 1}")
+            table = [["Types", "", ', '.join(option["types"])], ["Covered", len(option["covered"]), ', '.join(option["covered"])], ["Not covered", len(option["not_covered"]), ', '.join(option["not_covered"])]]
+            print(tabulate(table, tablefmt="double_grid"))
+        if result["total_options"] > len(result["options"]):
+            print(f"...and {result['total_options'] - len(result['options'])} more options with the same coverage")
+
+'''
+Turn on profiling. Stages, HTTP requests and combos scored are recorded until write_profile is called
+'''
+def start_profile():
+    global PROFILE
+    PROFILE = {"start": time.perf_counter(), "events": [], "stages": {}, "http": {}, "combos_evaluated": 0}
+
+'''
+Time a stage of the program when profiling is on. Use it as "with profile_stage(name):"
+Stages with the same name add up
+
+:param name: Stage name
+:type name: str
+:return: A context manager that records the stage, or one that does nothing if profiling is off
+:rtype: contextlib.AbstractContextManager
+'''
+def profile_stage(name):
+    if PROFILE is None:
+        return _no_profile
+    return _timed_stage(name)
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        record_event(name, "stage", start, end)
+        with _profile_lock:
+            PROFILE["stages"][name] = PROFILE["stages"].get(name, 0) + end - start
+
+'''
+Add a Chrome trace "complete" event to the profile
+
+:param name: Event name
+:type name: str
+:param category: Event category, "stage" or "http"
+:type category: str
+:param start: perf_counter time the event started
+:type start: float
+:param end: perf_counter time the event ended
+:type end: float
+:param args: Extra details shown with the event
+:type args: dict
+'''
+def record_event(name, category, start, end, args=None):
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": round((start - PROFILE["start"]) * 1e6),
+        "dur": round((end - start) * 1e6),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = args
+    with _profile_lock:
+        PROFILE["events"].append(event)
+
+# Upper bounds in milliseconds of the HTTP latency histogram buckets. Slower requests go in the last bucket
+LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000]
+
+'''
+Record one HTTP request in the profile, grouped by endpoint family (version-group, generation, pokemon, move, type)
+
+:param url: request URL
+:type url: str
+:param start: perf_counter time the request started
+:type start: float
+:param end: perf_counter time the response arrived
+:type end: float
+:param n_bytes: Size of the response body
+:type n_bytes: int
+:param status: HTTP status code
+:type status: int
+'''
+def record_http(url, start, end, n_bytes, status):
+    path = urlparse(url).path.strip("/").split("/")
+    if len(path) > 2 and path[:2] == ["api", "v2"]:
+        family = path[2]
+    elif path[0] == "graphql":
+        family = "graphql"
+    else:
+        family = urlparse(url).netloc
+    ms = (end - start) * 1000
+    bucket = next((f"<{b}ms" for b in LATENCY_BUCKETS if ms < b), f">={LATENCY_BUCKETS[-1]}ms")
+
+    record_event(family, "http", start, end, {"url": url, "bytes": n_bytes, "status": status})
+    with _profile_lock:
+        stats = PROFILE["http"].setdefault(family, {"requests": 0, "bytes": 0, "seconds": 0, "latency_ms": {}})
+        stats["requests"] += 1
+        stats["bytes"] += n_bytes
+        stats["seconds"] += end - start
+        stats["latency_ms"][bucket] = stats["latency_ms"].get(bucket, 0) + 1
+
+'''
+Add to the number of type combos scored in the profile
+
+:param n: Number of combos
+:type n: int
+'''
+def record_combos(n):
+    with _profile_lock:
+        PROFILE["combos_evaluated"] += n
+
+'''
+Save the profile and turn profiling off
+The file is a Chrome trace (open it in chrome://tracing or Perfetto). Alongside "traceEvents" it has
+the summed stage times, HTTP stats per endpoint family and the number of combos scored
+
+:param path: Where to save the profile
+:type path: str
+:return: The saved profile
+:rtype: dict
+'''
+def write_profile(path):
+    global PROFILE
+    profile = PROFILE
+    PROFILE = None
+    trace = {
+        "traceEvents": profile["events"],
+        "displayTimeUnit": "ms",
+        "total_seconds": time.perf_counter() - profile["start"],
+        "stages": profile["stages"],
+        "http": profile["http"],
+        "combos_evaluated": profile["combos_evaluated"],
+        "cache": dict(CACHE_STATS),
+    }
+    with open(path, "w") as f:
+        json.dump(trace, f)
+    return trace
 
 '''
 Call API and get a list of valid game versions
@@ -136,6 +706,31 @@ def get_valid_versions():
         valid.append(v['name'])
     return valid
 
+'''
+Get a list of valid game versions without calling the API when possible
+The precompiled chart's list is used if it has every needed version. Otherwise the list is fetched (or read from the cache)
+
+:param needed: Versions that must be in the list for the precompiled one to be used
+:type needed: list
+:return: A list of game version names
+:rtype: list
+'''
+def get_versions(needed=()):
+    type_chart = load_type_chart()
+    if type_chart and all(v in type_chart["version_groups"] for v in needed):
+        return list(type_chart["version_groups"])
+    return get_valid_versions()
+
+'''
+Call tabulate, importing it the first time it's needed so startup doesn't pay for it
+
+:return: The formatted table
+:rtype: str
+'''
+def tabulate(*args, **kwargs):
+    from tabulate import tabulate as _tabulate
+    return _tabulate(*args, **kwargs)
+
 '''
 Gets a set of available types in a given generation
 
@@ -151,10 +746,10 @@ def get_available_types(gen):
         for t in generation["types"]:
             # Some generations have special types. After the /type/ portion of the URL, these have values greater than double digits
             t_url = t["url"]
-            # Cut off the beginning of the type URL and the last character, "/"
-            # Ex: https://pokeapi.co/api/v2/type/10002/
+            # Take the last part of the type URL, without the last character, "/"
+            # Ex: https://pokeapi.co/api/v2/type/10002/ (or /api/v2/type/10002/ in an api-data mirror)
             # Turns into 10002
-            t_url = t_url[31:-1]
+            t_url = t_url.rstrip("/").split("/")[-1]
             t_url = int(t_url)
             if t_url < 20:
                 types.add(t["name"])
@@ -200,20 +795,518 @@ Get the number of a generation from the string "generation-xyz" where xyz is the
 '''
 def get_gen_num(generation):
     rn = generation[11:].upper()
+    import roman
     return(roman.fromRoman(rn))
 
 '''
 Get JSON from URL
+Responses are served from the local cache when possible. In offline mode a cache miss exits.
 
 :param url: request URL
 :type url: str
+:param payload: If given, POST this as the JSON body instead of a GET, like a GraphQL query
+:type payload: dict
 :return: JSON data from get request
 :rtype: dict (in most cases for this program)
 '''
-def url_to_json(url):
-    j = requests.get(url).json()
+def url_to_json(url, payload=None):
+    # A POST body is part of what's being asked for, so it's part of the cache key
+    if payload is not None:
+        url_key = url + "#" + json.dumps(payload, sort_keys=True)
+    else:
+        url_key = url
+    key = url_key.rstrip("/")
+    with _cache_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            CACHE_STATS["memory_hits"] += 1
+            return _memory_cache[key]
+
+    # Files in the mirror are already local, so they don't go through the response cache
+    if MIRROR_DIR and payload is None:
+        j = mirror_to_json(url)
+        remember(key, j)
+        return j
+
+    if CACHE_ENABLED:
+        cached = cache_get(url_key)
+        with _cache_lock:
+            if cached is not None:
+                CACHE_STATS["hits"] += 1
+        if cached is not None:
+            remember(key, cached)
+            return cached
+        with _cache_lock:
+            CACHE_STATS["misses"] += 1
+
+    if OFFLINE:
+        sys.exit(f"Offline mode: '{url_key}' is not in the cache.")
+
+    if payload is None:
+        j = http_get(url).json()
+    else:
+        j = http_post(url, payload).json()
+    if payload is not None and "errors" in j:
+        # GraphQL sends errors in the body with a 200 status, so check before caching
+        sys.exit(f"Query to '{url}' failed: {j['errors'][0]['message']}")
+    if CACHE_ENABLED:
+        cache_put(url_key, j)
+    remember(key, j)
     return j
 
+'''
+Use a local api-data mirror for API data, or stop using one
+
+:param path: Folder with the mirror, or None to use the network
+:type path: str
+'''
+def configure_mirror(path):
+    global MIRROR_DIR
+    with _mirror_lock:
+        if path != MIRROR_DIR:
+            _mirror_ids.clear()
+        MIRROR_DIR = path
+
+'''
+Get the folder in the mirror that matches https://pokeapi.co/api/v2. Both the api-data repo
+(with its data/api/v2 folder) and a folder that holds api/v2 directly work
+
+:return: Path of the api/v2 folder
+:rtype: str
+'''
+def mirror_root():
+    for root in (os.path.join(MIRROR_DIR, "data", "api", "v2"), os.path.join(MIRROR_DIR, "api", "v2")):
+        if os.path.isdir(root):
+            return root
+    return os.path.join(MIRROR_DIR, "data", "api", "v2")
+
+'''
+Get the name to number map of a resource in the mirror, reading its list the first time
+
+:param resource: API resource, like "pokemon"
+:type resource: str
+:return: Name to the number of its folder
+:rtype: dict
+'''
+def get_mirror_ids(resource):
+    with _mirror_lock:
+        if resource in _mirror_ids:
+            return _mirror_ids[resource]
+    try:
+        listing = read_mirror_file(os.path.join(mirror_root(), resource, "index.json"))
+    except OSError:
+        listing = {"results": []}
+    ids = {r["name"]: r["url"].rstrip("/").split("/")[-1] for r in listing["results"]}
+    with _mirror_lock:
+        return _mirror_ids.setdefault(resource, ids)
+
+'''
+Find the file in the mirror for an API URL. URLs can use names or numbers, and a URL without a name
+(with or without a query string like ?limit=) is the resource's full list
+
+:param url: API URL, or a path like the ones in api-data files
+:type url: str
+:return: Path of the JSON file, or None if the mirror doesn't have it
+:rtype: str
+'''
+def mirror_path(url):
+    parts = urlparse(url).path.strip("/").split("/")
+    if parts[:2] != ["api", "v2"] or len(parts) not in (3, 4):
+        return None
+    if len(parts) == 3:
+        return os.path.join(mirror_root(), parts[2], "index.json")
+    resource, ident = parts[2], parts[3]
+    if not ident.isdigit():
+        ident = get_mirror_ids(resource).get(ident)
+        if ident is None:
+            return None
+    return os.path.join(mirror_root(), resource, ident, "index.json")
+
+'''
+Read and parse a JSON file. It's read as bytes in one go and parsed without decoding it to a string first,
+which matters for the big Pokemon files
+
+:param path: Path of the JSON file
+:type path: str
+:return: JSON data
+:rtype: dict
+'''
+def read_mirror_file(path):
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+'''
+Get JSON for an API URL from the mirror
+Raises ValueError when the name isn't in the mirror's lists, the same as a 404 from the API.
+If it's listed but its file is missing, the mirror is incomplete, which exits with a message saying so
+
+:param url: API URL
+:type url: str
+:return: JSON data
+:rtype: dict
+'''
+def mirror_to_json(url):
+    path = mirror_path(url)
+    if path is None:
+        raise ValueError(f"'{url}' is not in the mirror")
+    if not os.path.isfile(path):
+        sys.exit(f"'{url}' is missing from the mirror at '{MIRROR_DIR}'. Use --verify-mirror to see what else is missing")
+    return read_mirror_file(path)
+
+'''
+Check that the mirror has every file this program can ask for: each resource's list and
+every version group, generation, type, Pokemon and move in those lists
+
+:return: Resource to a list of the names that are missing
+:rtype: dict
+'''
+def verify_mirror():
+    missing = {}
+    for resource in MIRROR_RESOURCES:
+        missing[resource] = []
+        if not os.path.isfile(os.path.join(mirror_root(), resource, "index.json")):
+            missing[resource].append(f"{resource}/index.json")
+            continue
+        for name, ident in get_mirror_ids(resource).items():
+            if not os.path.isfile(os.path.join(mirror_root(), resource, ident, "index.json")):
+                missing[resource].append(name)
+    return missing
+
+'''
+Unpack the resources this program uses from an api-data archive (a zip or tar of the repo, or of its data folder)
+
+:param archive: Path of the .zip, .tar or .tar.gz file
+:type archive: str
+:param path: Folder to unpack into. The files end up in path/data/api/v2
+:type path: str
+:return: Number of files unpacked
+:rtype: int
+'''
+def import_mirror(archive, path):
+    import shutil
+    import tarfile
+    import zipfile
+
+    def wanted(name):
+        # Keep the part from api/v2/ on, and only for resources the program uses
+        parts = name.replace("\\", "/").split("/")
+        for i in range(len(parts) - 3):
+            if parts[i:i + 2] == ["api", "v2"] and parts[i + 2] in MIRROR_RESOURCES and parts[-1] == "index.json":
+                if any(p in ("", ".", "..") for p in parts[i:]):
+                    return None
+                return os.path.join(path, "data", *parts[i:])
+        return None
+
+    n_files = 0
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as z:
+            for info in z.infolist():
+                target = wanted(info.filename)
+                if target and not info.is_dir():
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with z.open(info) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    n_files += 1
+    else:
+        with tarfile.open(archive) as t:
+            for member in t:
+                target = wanted(member.name)
+                if target and member.isfile():
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with t.extractfile(member) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    n_files += 1
+
+    # Names may point somewhere else now
+    with _mirror_lock:
+        _mirror_ids.clear()
+    return n_files
+
+'''
+Keep a response in the in-memory cache, dropping the least recently used ones if it's full
+
+:param key: URL without a trailing slash
+:type key: str
+:param data: JSON data from get request
+:type data: dict
+'''
+def remember(key, data):
+    with _cache_lock:
+        _memory_cache[key] = data
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+'''
+Get JSON for many URLs at once using a thread pool
+
+:param urls: request URLs
+:type urls: list
+:return: JSON data for each URL, in the same order as urls
+:rtype: list
+'''
+def urls_to_json(urls):
+    if len(urls) <= 1:
+        return [url_to_json(url) for url in urls]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        return list(pool.map(url_to_json, urls))
+
+'''
+Get the shared HTTP session, creating it on first use
+Connection errors and 429/5xx responses are retried with exponential backoff
+
+:return: Session with a connection pool big enough for MAX_WORKERS threads
+:rtype: requests.Session
+'''
+def get_session():
+    global _session
+    with _http_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+            retry = Retry(total=RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+'''
+Make a GET request through the shared session, waiting if the host already has HOST_CONCURRENCY requests in flight
+PokeAPI URLs are sent to API_BASE instead when it's set to something else
+
+:param url: request URL
+:type url: str
+:return: The response
+:rtype: requests.Response
+'''
+def http_get(url):
+    if API_BASE != POKEAPI_URL and url.startswith(POKEAPI_URL):
+        url = API_BASE + url[len(POKEAPI_URL):]
+    return send_request(url, lambda session: session.get(url))
+
+'''
+Make a POST request with a JSON body through the shared session, like a GraphQL query
+
+:param url: request URL
+:type url: str
+:param payload: JSON body
+:type payload: dict
+:return: The response
+:rtype: requests.Response
+'''
+def http_post(url, payload):
+    return send_request(url, lambda session: session.post(url, json=payload))
+
+'''
+Send a request, waiting if the host already has HOST_CONCURRENCY requests in flight, and record it when profiling
+
+:param url: request URL
+:type url: str
+:param send: Function that takes the session and sends the request
+:type send: function
+:return: The response
+:rtype: requests.Response
+'''
+def send_request(url, send):
+    host = urlparse(url).netloc
+    with _http_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+        limit = _host_limits[host]
+    session = get_session()
+    with limit:
+        if PROFILE is None:
+            return send(session)
+        start = time.perf_counter()
+        response = send(session)
+        record_http(url, start, time.perf_counter(), len(response.content), response.status_code)
+        return response
+
+'''
+Change the local cache settings. Arguments left as None keep their current value.
+
+:param path: Path to the SQLite cache file
+:type path: str
+:param ttl: Seconds before a cached response is considered stale
+:type ttl: int
+:param max_entries: Max number of responses to keep before evicting the least recently used
+:type max_entries: int
+:param offline: If True, only serve responses from the cache
+:type offline: bool
+:param enabled: If False, skip the cache entirely
+:type enabled: bool
+:param memory_size: Max number of responses to also keep in memory
+:type memory_size: int
+'''
+def configure_cache(path=None, ttl=None, max_entries=None, offline=None, enabled=None, memory_size=None):
+    global CACHE_PATH, CACHE_TTL, CACHE_MAX_ENTRIES, OFFLINE, CACHE_ENABLED, MEMORY_CACHE_SIZE, _cache_db
+    if path is not None and path != CACHE_PATH:
+        if _cache_db is not None:
+            flush_cache_used()
+            _cache_db.close()
+            _cache_db = None
+        CACHE_PATH = path
+    if ttl is not None:
+        CACHE_TTL = ttl
+    if max_entries is not None:
+        CACHE_MAX_ENTRIES = max_entries
+    if offline is not None:
+        OFFLINE = offline
+    if enabled is not None:
+        CACHE_ENABLED = enabled
+    if memory_size is not None:
+        MEMORY_CACHE_SIZE = memory_size
+
+'''
+Change where learnsets come from. Arguments left as None keep their current value.
+
+:param backend: "rest" or "graphql"
+:type backend: str
+:param graphql_url: GraphQL endpoint for the "graphql" backend
+:type graphql_url: str
+'''
+def configure_backend(backend=None, graphql_url=None):
+    global LEARNSET_BACKEND, GRAPHQL_URL
+    if backend is not None:
+        LEARNSET_BACKEND = backend
+    if graphql_url is not None:
+        GRAPHQL_URL = graphql_url
+
+'''
+Forget everything kept in memory between queries: responses, learnset indexes, generation lookups and
+the precompiled chart. The on-disk cache isn't touched
+'''
+def clear_memory_caches():
+    global _type_chart, _name_index
+    with _cache_lock:
+        _memory_cache.clear()
+    with _learnset_lock:
+        _learnset_indexes.clear()
+    with _batch_lock:
+        _version_gens.clear()
+        _gen_charts.clear()
+        _gen_multipliers.clear()
+        _gen_masks.clear()
+    _type_chart = None
+    with _name_lock:
+        _name_index = None
+
+'''
+Open the cache database, creating it on first use
+
+:return: Connection to the cache database
+:rtype: sqlite3.Connection
+'''
+def get_cache_db():
+    global _cache_db
+    if _cache_db is None:
+        cache_dir = os.path.dirname(CACHE_PATH)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        _cache_db = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _cache_db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, body BLOB, fetched REAL, used REAL)")
+        _cache_db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+    return _cache_db
+
+'''
+Get the cache key for a URL. "type/ghost" and "type/ghost/" are the same resource, so trailing slashes are ignored.
+
+:param url: request URL
+:type url: str
+:return: Hex digest of the normalized URL
+:rtype: str
+'''
+def cache_key(url):
+    return hashlib.sha256(url.rstrip("/").encode()).hexdigest()
+
+'''
+Look up a URL in the cache
+
+:param url: request URL
+:type url: str
+:return: Cached JSON data, or None if missing or older than the TTL (stale data is still used in offline mode)
+:rtype: dict
+'''
+def cache_get(url):
+    key = cache_key(url)
+    with _cache_lock:
+        db = get_cache_db()
+        row = db.execute("SELECT body, fetched FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        body, fetched = row
+        now = time.time()
+        if not OFFLINE and now - fetched > CACHE_TTL:
+            return None
+        _cache_used[key] = now
+        if len(_cache_used) >= CACHE_USED_BATCH:
+            write_cache_used(db)
+            db.commit()
+    return json.loads(zlib.decompress(body))
+
+'''
+Get when the cached response for a URL was fetched, without reading or decoding it
+
+:param url: request URL
+:type url: str
+:return: Time the response was stored, or None if it isn't in the cache
+:rtype: float
+'''
+def cache_fetched(url):
+    with _cache_lock:
+        row = get_cache_db().execute("SELECT fetched FROM responses WHERE key = ?", (cache_key(url),)).fetchone()
+    return row[0] if row else None
+
+'''
+Write the pending last-used times from cache hits. The caller holds _cache_lock and commits
+
+:param db: Connection to the cache database
+:type db: sqlite3.Connection
+'''
+def write_cache_used(db):
+    if _cache_used:
+        db.executemany("UPDATE responses SET used = ? WHERE key = ?", [(used, key) for key, used in _cache_used.items()])
+        _cache_used.clear()
+
+'''
+Save the pending last-used times from cache hits, if the cache database is open
+'''
+def flush_cache_used():
+    with _cache_lock:
+        if _cache_db is not None and _cache_used:
+            write_cache_used(_cache_db)
+            _cache_db.commit()
+
+# Registered once here rather than in get_cache_db, which runs again each time the database is reopened
+atexit.register(flush_cache_used)
+
+'''
+Store JSON data for a URL in the cache, then evict the least recently used responses if over the size limit
+
+:param url: request URL
+:type url: str
+:param data: JSON data from get request
+:type data: dict
+'''
+def cache_put(url, data):
+    now = time.time()
+    body = zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+    with _cache_lock:
+        db = get_cache_db()
+        # Eviction goes by last use, so the pending times from cache hits have to be in first
+        write_cache_used(db)
+        db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (cache_key(url), url, body, now, now))
+
+        count = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > CACHE_MAX_ENTRIES:
+            extra = count - CACHE_MAX_ENTRIES
+            db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used LIMIT ?)", (extra,))
+            CACHE_STATS["evictions"] += extra
+        db.commit()
+
 '''
 Retrive a single Pokemon from the API and return JSON
 
@@ -224,12 +1317,145 @@ Retrive a single Pokemon from the API and return JSON
 :rtype: dict
 '''
 def get_pkmn_json(pkmn_name):
+    pkmn_name = resolve_pkmn_name(pkmn_name)
     try:
         j = url_to_json(f"https://pokeapi.co/api/v2/pokemon/{pkmn_name}")
     except ValueError:
         sys.exit(f"Pokemon named '{pkmn_name}' not found.")
     return j
 
+'''
+Get every Pokemon, form and species name as a sorted list, so names can be checked and searched by prefix without calling the API
+It's built from the Pokemon and species lists the first time, which come from the response cache or mirror after that.
+If the lists can't be had (offline with nothing cached, or no network), there's no index and names aren't checked.
+That isn't remembered, so the next call tries again
+
+:return: Sorted names, name to position in Pokedex order, and the set of species names that aren't also a Pokemon name. None if the lists can't be had
+:rtype: tuple
+'''
+def get_name_index():
+    global _name_index
+    with _name_lock:
+        if _name_index is None:
+            order = {}
+            try:
+                for name in get_species_names():
+                    order.setdefault(name, len(order))
+                species_list = url_to_json("https://pokeapi.co/api/v2/pokemon-species?limit=100000")["results"]
+            # Network errors from requests are OSErrors, so requests doesn't have to be imported to catch them
+            except (ValueError, OSError, SystemExit):
+                return None
+            species = set()
+            for entry in species_list:
+                if entry["name"] not in order:
+                    order[entry["name"]] = len(order)
+                    species.add(entry["name"])
+            _name_index = (sorted(order), order, species)
+        return _name_index
+
+'''
+Find the names that start with a prefix, with a binary search over the sorted names
+
+:param prefix: Start of a name
+:type prefix: str
+:param names: Sorted names
+:type names: list
+:return: Names that start with prefix, in ABC order
+:rtype: list
+'''
+def names_with_prefix(prefix, names):
+    matches = []
+    for i in range(bisect_left(names, prefix), len(names)):
+        if not names[i].startswith(prefix):
+            break
+        matches.append(names[i])
+    return matches
+
+'''
+Count the letters that have to be added, removed or changed to turn one word into another (Levenshtein distance)
+Gives up as soon as the distance has to be more than limit, since only close names are worth suggesting
+
+:param a: First word
+:type a: str
+:param b: Second word
+:type b: str
+:param limit: Largest distance that matters
+:type limit: int
+:return: The distance, or limit + 1 if it's more than limit
+:rtype: int
+'''
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i]
+        for j, cb in enumerate(b, 1):
+            row.append(min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(row) > limit:
+            return limit + 1
+        prev = row
+    return prev[-1]
+
+'''
+Suggest names close to one that wasn't found: the closest spellings first, then names that start with it
+
+:param pkmn_name: Name that wasn't found
+:type pkmn_name: str
+:param n: Max number of suggestions
+:type n: int
+:return: Up to n names, best first
+:rtype: list
+'''
+def suggest_names(pkmn_name, n=5):
+    index = get_name_index()
+    if index is None:
+        return []
+    names, order, _ = index
+    limit = 1 if len(pkmn_name) < 5 else 2
+    close = []
+    for name in names:
+        d = edit_distance(pkmn_name, name, limit)
+        if d <= limit:
+            close.append((d, order[name], name))
+    suggestions = [name for _, _, name in sorted(close)]
+    suggestions += [name for name in sorted(names_with_prefix(pkmn_name, names), key=order.get) if name not in suggestions]
+    return suggestions[:n]
+
+'''
+Check a Pokemon name against the name index before anything is fetched
+A species name that isn't a Pokemon name by itself (e.g. giratina) becomes the species' default form (giratina-altered).
+Anything else that isn't an exact name, like the start of one, exits with suggestions
+
+:param pkmn_name: Name of Pokemon, any case
+:type pkmn_name: str
+:except SystemExit: If the name isn't a Pokemon, with suggestions in the message
+:return: The lowercase name the API knows the Pokemon by
+:rtype: str
+'''
+def resolve_pkmn_name(pkmn_name):
+    name = pkmn_name.strip().lower().replace(" ", "-")
+    index = get_name_index()
+    if index is None or name.isdigit():
+        return name
+    _, order, species = index
+    if name in species:
+        try:
+            species_json = url_to_json(f"https://pokeapi.co/api/v2/pokemon-species/{name}")
+        except (ValueError, OSError, SystemExit):
+            return name
+        for variety in species_json["varieties"]:
+            if variety["is_default"]:
+                return variety["pokemon"]["name"]
+        return name
+    if name in order:
+        return name
+    suggestions = suggest_names(name)
+    message = f"Pokemon named '{name}' not found."
+    if suggestions:
+        message += f" Did you mean {', '.join(suggestions)}?"
+    sys.exit(message)
+
 '''
 Check if a Pokemon is available in a given version
 
@@ -285,8 +1511,8 @@ def learnable_in_version(move, version):
     return False
 
 '''
-Create a dict of move type to list of lists containing move attributes
-Each item in the dict list goes: [move name, move learn method, level learned]
+Create a dict of move type to list of Move records
+Each record goes: (move name, level learned, move learn method)
 
 :param pkmn_json: Pokemon data from API
 :type pkmn_json: dict
@@ -298,34 +1524,167 @@ Each item in the dict list goes: [move name, move learn method, level learned]
 def classify_moves(pkmn_json, version):
     moves_dict = {}
 
-    # move is the move info from the Pokemon moves json, which only includes name and learn details
-    for move in pkmn_json['moves']:
-        if learnable_in_version(move, version):
-            # move_json is the url to the move details including damange and type
-            move_json = url_to_json(move['move']['url'])
-            if does_damage(move_json):
-                type_ = get_move_type(move_json)
-                if type_ not in moves_dict:
-                    moves_dict[type_] = []
-                
-                # Find the version group that matches input version
-                for vgd_idx in move['version_group_details']:
-                    if vgd_idx['version_group']['name'] == version:
-                        name = move['move']['name'].title()
-                        method = vgd_idx['move_learn_method']['name'].title()
-                        if method != "Level-Up":
-                            level = "N/A"
-                        else:
-                            level = vgd_idx['level_learned_at']
-                        new_move = [name, level, method]
-                        moves_dict[type_].append(new_move)
-                        continue
+    entries, move_info = get_version_learnset(pkmn_json, version)
+
+    for name, url, method, level in entries:
+        type_, power = move_info[url]
+        if power:
+            if type_ not in moves_dict:
+                moves_dict[type_] = []
+            method = method.title()
+            if method != "Level-Up":
+                level = "N/A"
+            moves_dict[type_].append(Move(name.title(), level, method))
 
     return moves_dict
 
 '''
-Determine which generation's damage relations to use
-Returning (0,0) indicates we need to use the latest type effectiveness available
+Get the moves a Pokemon learns in a version, along with the type and power of each move, from LEARNSET_BACKEND
+
+:param pkmn_json: Pokemon data from API
+:type pkmn_json: dict
+:param version: Game version
+:type version: str
+:return: List of [move name, move url, learn method, level learned], and a dict of move url to [type, power]
+    that has at least every move in the list
+:rtype: list, dict
+'''
+def get_version_learnset(pkmn_json, version):
+    if LEARNSET_BACKEND == "graphql":
+        return get_learnset_graphql(pkmn_json["name"], version)
+
+    # The index has this version's learnset in the same order as the Pokemon JSON,
+    # along with the type and power of every move looked up so far
+    index = get_learnset_index(pkmn_json)
+    entries = index["versions"].get(version, [])
+    join_move_info(index, [url for _, url, _, _ in entries])
+    return entries, index["moves"]
+
+'''
+Get the moves a Pokemon learns in a version with one GraphQL query, which also has each move's type and power
+The response is cached like any other, so the same Pokemon and version never needs the query again
+
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:param version: Game version
+:type version: str
+:return: Same as get_version_learnset
+:rtype: list, dict
+'''
+def get_learnset_graphql(pkmn_name, version):
+    j = url_to_json(GRAPHQL_URL, {"query": LEARNSET_QUERY, "variables": {"pokemon": pkmn_name, "version": version}})
+    entries = []
+    move_info = {}
+    for row in j["data"]["pokemon_v2_pokemonmove"]:
+        move = row["pokemon_v2_move"]
+        # Same URL the REST data uses, so moves line up with the rest of the program
+        url = f"https://pokeapi.co/api/v2/move/{row['move_id']}/"
+        entries.append([move["name"], url, row["pokemon_v2_movelearnmethod"]["name"], row["level"]])
+        move_info[url] = [move["pokemon_v2_type"]["name"], move["power"]]
+    return entries, move_info
+
+'''
+Build a learnset index from a Pokemon's JSON so each version's moves are a dict lookup
+instead of a scan over every move's version_group_details
+
+:param pkmn_json: Pokemon data from API
+:type pkmn_json: dict
+:return: {"pokemon": name, "versions": version -> list of [move name, move url, learn method, level learned],
+    "moves": move url -> [type, power]}. "moves" starts empty and is filled in by join_move_info
+:rtype: dict
+'''
+def build_learnset_index(pkmn_json):
+    versions = {}
+    for move in pkmn_json['moves']:
+        name = move['move']['name']
+        url = move['move']['url']
+        for vgd in move['version_group_details']:
+            version = vgd['version_group']['name']
+            if version not in versions:
+                versions[version] = []
+            versions[version].append([name, url, vgd['move_learn_method']['name'], vgd['level_learned_at']])
+    return {"pokemon": pkmn_json.get('name'), "versions": versions, "moves": {}}
+
+'''
+Get the learnset index of a Pokemon, building it the first time
+Indexes are kept in memory and in the response cache, so querying the same Pokemon in another version
+doesn't rebuild it or refetch moves that were already looked up.
+Each index notes when the cached Pokemon response it was built from was fetched. Once that response
+is refetched, the old index no longer matches and is built again from the new data
+
+:param pkmn_json: Pokemon data from API
+:type pkmn_json: dict
+:return: Learnset index from build_learnset_index, with a "fetched" key
+:rtype: dict
+'''
+def get_learnset_index(pkmn_json):
+    name = pkmn_json.get('name')
+    if name is None:
+        return build_learnset_index(pkmn_json)
+
+    # Mirror files don't go through the response cache, and they don't change, so there's nothing to match
+    use_cache = CACHE_ENABLED and not MIRROR_DIR
+    fetched = cache_fetched(f"https://pokeapi.co/api/v2/pokemon/{name}") if use_cache else None
+    with _learnset_lock:
+        index = _learnset_indexes.get(name)
+        if index is not None and index.get("fetched") == fetched:
+            _learnset_indexes.move_to_end(name)
+            return index
+    index = cache_get(learnset_cache_url(name)) if use_cache else None
+    if index is None or index.get("fetched") != fetched:
+        index = build_learnset_index(pkmn_json)
+        index["fetched"] = fetched
+    with _learnset_lock:
+        current = _learnset_indexes.get(name)
+        if current is not None and current.get("fetched") == fetched:
+            # Another thread got here first
+            index = current
+        _learnset_indexes[name] = index
+        _learnset_indexes.move_to_end(name)
+        while len(_learnset_indexes) > LEARNSET_CACHE_SIZE:
+            _learnset_indexes.popitem(last=False)
+    return index
+
+'''
+Get the URL a learnset index is stored under in the response cache
+
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:return: The Pokemon's API URL with a #learnset suffix
+:rtype: str
+'''
+def learnset_cache_url(pkmn_name):
+    return f"https://pokeapi.co/api/v2/pokemon/{pkmn_name}#learnset"
+
+'''
+Look up the type and power of any moves the index doesn't have yet. They're fetched in parallel,
+then the updated index is saved to the cache (unless it's off or a mirror is used)
+
+:param index: Learnset index from get_learnset_index
+:type index: dict
+:param urls: Move URLs that are needed
+:type urls: list
+'''
+def join_move_info(index, urls):
+    # dict.fromkeys drops repeats (moves learned more than one way) but keeps the order
+    missing = [url for url in dict.fromkeys(urls) if url not in index["moves"]]
+    if not missing:
+        return
+
+    # Fetch the details of every missing move in parallel. Results come back in the same order as the URLs
+    move_jsons = urls_to_json(missing)
+    with _learnset_lock:
+        for url, move_json in zip(missing, move_jsons):
+            index["moves"][url] = [get_move_type(move_json), move_json["power"]]
+
+    if index["pokemon"] is not None and CACHE_ENABLED and not MIRROR_DIR:
+        with _learnset_lock:
+            saved = json.loads(json.dumps(index))
+        cache_put(learnset_cache_url(index["pokemon"]), saved)
+
+'''
+Determine which generation's damage relations to use
+Returning (0,0) indicates we need to use the latest type effectiveness available
 
 :param gen: Integer generation number
 :type gen: int
@@ -369,16 +1728,37 @@ Create a dictionary of type to type coverage
 :type types: set
 :param gen: Integer generation number
 :type gen: int
+:param types_in_gen: Types that exist in the generation, if types isn't all of them (e.g. shadow moves)
+:type types_in_gen: set
 :return: Types to a set of types that the type is super effective against
 :rtype: dict 
 '''
-def create_type_to_se_dict(types, gen):
+def create_type_to_se_dict(types, gen, types_in_gen=None):
+    types_in_gen = types if types_in_gen is None else types_in_gen
     type_to_se = {}
     for type in types:
         type_json = url_to_json(f"https://pokeapi.co/api/v2/type/{type}")
-        type_to_se[type] = get_super_effective(type_json, gen)
+        type_to_se[type] = get_super_effective(type_json, gen, types_in_gen)
     return type_to_se
 
+'''
+Get the damage relations of a type that apply in a given generation
+
+:param type_json: Type info from API
+:type type_json: dict
+:param gen: Integer generation number
+:type gen: int
+:return: The damage_relations dict for that generation
+:rtype: dict
+'''
+def get_damage_relations(type_json, gen):
+    if type_json['past_damage_relations']:
+        past_drs = get_past_dr_list(type_json)
+        gen_to_use = get_dr_to_use(gen, past_drs)
+        if gen_to_use != (0,0):
+            return type_json['past_damage_relations'][gen_to_use[0]]["damage_relations"]
+    return type_json['damage_relations']
+
 '''
 Get a set of super effective coverage for a single type
 
@@ -386,39 +1766,79 @@ Get a set of super effective coverage for a single type
 :type type_json: dict
 :param gen: Integer generation number
 :type gen: int
+:param types_in_gen: If given, leave out types that aren't in the generation
+:type types_in_gen: set
 :return: Set of types the input type is super effective against
 :rtype: set
 '''
-def get_super_effective(type_json, gen):
+def get_super_effective(type_json, gen, types_in_gen=None):
     super_effective = set()
 
     # Normal type moves are not super effective to anything, so return an empty set
     if type_json['name'] == "normal":
         return super_effective
 
-    if type_json['past_damage_relations']:
-        past_drs = get_past_dr_list(type_json)
-        gen_to_use = get_dr_to_use(gen, past_drs)
-        if gen_to_use != (0,0):
-            double_prop = type_json['past_damage_relations'][gen_to_use[0]]["damage_relations"]["double_damage_to"]
-        else:
-            double_prop = type_json['damage_relations']['double_damage_to']
-    else:
-        double_prop = type_json['damage_relations']['double_damage_to']
+    double_prop = get_damage_relations(type_json, gen)['double_damage_to']
     for d in double_prop:
-        super_effective.add(d['name'])
+        # PokeAPI only keeps past relations for changes to types that existed, so older generations
+        # get newer types too (gen 1 fighting hits dark and steel)
+        if types_in_gen is None or d['name'] in types_in_gen:
+            super_effective.add(d['name'])
     return super_effective
 
 '''
-Given a set of types, get all possible combinations of 4 (Pokemon can only have 4 moves at a time max)
+Get the damage multipliers of a single attacking type. Defending types not listed take normal (1x) damage
+
+:param type_json: Type info from API
+:type type_json: dict
+:param gen: Integer generation number
+:type gen: int
+:param types_in_gen: If given, leave out types that aren't in the generation, like get_super_effective
+:type types_in_gen: set
+:return: Defending type to multiplier (2, 0.5 or 0)
+:rtype: dict
+'''
+def get_damage_multipliers(type_json, gen, types_in_gen=None):
+    multipliers = {}
+    drs = get_damage_relations(type_json, gen)
+    for key, multiplier in [("double_damage_to", 2), ("half_damage_to", 0.5), ("no_damage_to", 0)]:
+        for d in drs[key]:
+            if types_in_gen is None or d['name'] in types_in_gen:
+                multipliers[d['name']] = multiplier
+    return multipliers
+
+'''
+Create a dictionary of type to damage multipliers
+
+:param types: Each type in the given gen
+:type types: set
+:param gen: Integer generation number
+:type gen: int
+:param types_in_gen: Types that exist in the generation, if types isn't all of them
+:type types_in_gen: set
+:return: Types to a dict of defending type to multiplier
+:rtype: dict
+'''
+def create_type_to_multipliers_dict(types, gen, types_in_gen=None):
+    types_in_gen = types if types_in_gen is None else types_in_gen
+    type_to_multipliers = {}
+    for type in types:
+        type_json = url_to_json(f"https://pokeapi.co/api/v2/type/{type}")
+        type_to_multipliers[type] = get_damage_multipliers(type_json, gen, types_in_gen)
+    return type_to_multipliers
+
+'''
+Given a set of types, get all possible combinations of size types (4 by default, since Pokemon can only have 4 moves at a time max)
 
 :param types: Set of types
 :type types: set
-:return: Set of tuples representing type combos for each combination of 4
+:param size: Number of types in a combo, for formats that allow a different number of moves
+:type size: int
+:return: Set of tuples representing type combos for each combination of size types
 :return type: set
 '''
-def get_type_combos(types):
-    if len(types) <= 4:
+def get_type_combos(types, size=4):
+    if len(types) <= size:
         # itertools.combinations returns a tuple so we need to convert types to a tuple 
         # for create_se_set to work properly later
         # if we just do set(list(types)) it will loop over letters of each type instead of each type
@@ -427,7 +1847,7 @@ def get_type_combos(types):
         tc.add(types)
         return tc
     else:
-        return set(list(combinations(types, 4)))
+        return set(combinations(types, size))
 
 '''
 Given a list of types, create a set of types the list is super-effective to
@@ -452,7 +1872,7 @@ Creates two dicts out of a set of type combinations
 types_to_se: A type combination to a set of types the combo covers super effectively
 se_lens: The number of types the combo covers super effectively to a list of the combos
 
-:param combos: Set of tuples representing type combos for each combination of 4
+:param combos: Set of tuples representing type combos, like from get_type_combos
 :param type: set
 :param type_to_se_dict: Types to a set of types that the type is super effective against
 :type type_to_se_dict: dict
@@ -473,5 +1893,1402 @@ def create_se_sets(combos, type_to_se_dict):
     
     return se_lens, types_to_se
 
+'''
+Turn each type's super effective set into an integer bitmask, one bit per defending type
+A combo's coverage is then the OR of its types' masks, and its size is the popcount
+
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:return: Types to bitmask, and the sorted list of defending types where index i is bit i
+:rtype: dict, list
+'''
+def create_type_masks(type_to_se_dict):
+    defenders = sorted(set().union(*type_to_se_dict.values()))
+    bits = {t: 1 << i for i, t in enumerate(defenders)}
+
+    masks = {}
+    for t, se in type_to_se_dict.items():
+        mask = 0
+        for d in se:
+            mask |= bits[d]
+        masks[t] = mask
+    return masks, defenders
+
+'''
+Turn a coverage bitmask back into a set of types
+
+:param mask: Coverage bitmask
+:type mask: int
+:param defenders: Defending types where index i is bit i
+:type defenders: list
+:return: Set of types in the mask
+:rtype: set
+'''
+def mask_to_types(mask, defenders):
+    return {t for i, t in enumerate(defenders) if mask >> i & 1}
+
+'''
+Find the type combos that cover the most types super effectively
+Combos are streamed from itertools.combinations and scored with bitmasks, and only the best ones are kept
+
+:param types: Set of types
+:type types: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:param size: Number of types in a combo
+:type size: int
+:return: List of the best combos in sorted order, and a dict of each of those combos to the set of types it covers
+:rtype: list, dict
+'''
+def get_best_combos(types, type_to_se_dict, size=4):
+    masks, defenders = create_type_masks(type_to_se_dict)
+    types = sorted(types)
+    if len(types) <= size:
+        combos = [tuple(types)]
+    else:
+        combos = combinations(types, size)
+
+    best_len = -1
+    best = []
+    for c in combos:
+        mask = 0
+        for t in c:
+            mask |= masks[t]
+        n = mask.bit_count()
+        if n > best_len:
+            best_len = n
+            best = [(c, mask)]
+        elif n == best_len:
+            best.append((c, mask))
+
+    if PROFILE is not None:
+        record_combos(comb(len(types), size) if len(types) > size else 1)
+
+    max_combos = [c for c, _ in best]
+    combos_to_se = {c: mask_to_types(mask, defenders) for c, mask in best}
+    return max_combos, combos_to_se
+
+'''
+Find the n best type combos, best first, without keeping every combo around
+Combos are streamed from itertools.combinations into a heap that never holds more than n of them.
+They're ranked by coverage, then by the secondary score (the sum of each type's weight),
+then by which combo comes first in ABC order, so the same input always gives the same ranking
+
+:param types: Set of types
+:type types: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:param n: Number of combos to keep
+:type n: int
+:param size: Number of types in a combo
+:type size: int
+:param weights: Types to a number used to break coverage ties, like how many moves of that type are learnable
+:type weights: dict
+:return: List of up to n combos in rank order, and a dict of each of those combos to the set of types it covers
+:rtype: list, dict
+'''
+def get_top_combos(types, type_to_se_dict, n, size=4, weights=None):
+    masks, defenders = create_type_masks(type_to_se_dict)
+    weights = weights or {}
+    types = sorted(types)
+    if len(types) <= size:
+        combos = [tuple(types)]
+    else:
+        combos = combinations(types, size)
+
+    # Min-heap of (coverage, secondary score, -position), so the worst combo kept is always on top
+    # Combos come out in ABC order, so a lower position wins ties
+    heap = []
+    for i, c in enumerate(combos):
+        mask = 0
+        score = 0
+        for t in c:
+            mask |= masks[t]
+            score += weights.get(t, 0)
+        item = (mask.bit_count(), score, -i, c, mask)
+        if len(heap) < n:
+            heapq.heappush(heap, item)
+        elif item[:3] > heap[0][:3]:
+            heapq.heapreplace(heap, item)
+
+    if PROFILE is not None:
+        record_combos(comb(len(types), size) if len(types) > size else 1)
+
+    ranked = sorted(heap, reverse=True)
+    top_combos = [c for _, _, _, c, _ in ranked]
+    combos_to_se = {c: mask_to_types(mask, defenders) for _, _, _, c, mask in ranked}
+    return top_combos, combos_to_se
+
+'''
+Find the best combos that include every locked type, for "what if I keep these moves" questions
+The locked types' coverage is worked out once, then only the free slots are searched over the other types
+
+:param types: Set of types
+:type types: set
+:param locked: Types every combo has to include
+:type locked: set
+:param masks: Types to coverage bitmask, like from get_gen_masks
+:type masks: dict
+:param defenders: Defending types where index i is bit i
+:type defenders: list
+:param size: Number of types in a combo, locked ones included
+:type size: int
+:return: List of the best combos in sorted order, and a dict of each of those combos to the set of types it covers
+:rtype: list, dict
+'''
+def get_locked_combos(types, locked, masks, defenders, size=4):
+    locked_mask = 0
+    for t in locked:
+        locked_mask |= masks[t]
+
+    free = sorted(set(types) - set(locked))
+    n_free = size - len(locked)
+    if len(free) <= n_free:
+        fills = [tuple(free)]
+    else:
+        fills = combinations(free, n_free)
+
+    best_len = -1
+    best = []
+    for f in fills:
+        mask = locked_mask
+        for t in f:
+            mask |= masks[t]
+        n = mask.bit_count()
+        if n > best_len:
+            best_len = n
+            best = [(f, mask)]
+        elif n == best_len:
+            best.append((f, mask))
+
+    if PROFILE is not None:
+        record_combos(comb(len(free), n_free) if len(free) > n_free else 1)
+
+    best = sorted((tuple(sorted(set(f) | set(locked))), mask) for f, mask in best)
+    max_combos = [c for c, _ in best]
+    combos_to_se = {c: mask_to_types(mask, defenders) for c, mask in best}
+    return max_combos, combos_to_se
+
+'''
+Import NumPy for the vectorized engine. It's optional, so only import it when that engine is used
+
+:return: The numpy module
+:rtype: module
+'''
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        sys.exit("The numpy engine needs NumPy. Install it with 'pip install numpy' or use '--engine bitmask'")
+    return numpy
+
+'''
+Create a boolean matrix of attacking type x defending type, True where the attack is super effective
+
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:return: The matrix, the attacking types in row order and the defending types in column order
+:rtype: numpy.ndarray, list, list
+'''
+def create_se_matrix(type_to_se_dict):
+    np = import_numpy()
+    attackers = sorted(type_to_se_dict)
+    defenders = sorted(set().union(*type_to_se_dict.values()))
+    columns = {t: i for i, t in enumerate(defenders)}
+
+    matrix = np.zeros((len(attackers), len(defenders)), dtype=bool)
+    for row, t in enumerate(attackers):
+        for d in type_to_se_dict[t]:
+            matrix[row, columns[d]] = True
+    return matrix, attackers, defenders
+
+'''
+Pack each row of the super effective matrix into uint64 bitmasks, bit i being defending type i
+Rows with more than 64 defending types (e.g. dual types) are split over several words
+
+:param matrix: Super effective matrix from create_se_matrix
+:type matrix: numpy.ndarray
+:return: Array of shape (attacking types, words)
+:rtype: numpy.ndarray
+'''
+def pack_se_matrix(matrix):
+    np = import_numpy()
+    n_words = max(1, -(-matrix.shape[1] // 64))
+    padded = np.zeros((matrix.shape[0], n_words * 64), dtype=np.uint64)
+    padded[:, :matrix.shape[1]] = matrix
+    weights = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+    return (padded.reshape(matrix.shape[0], n_words, 64) * weights).sum(axis=2, dtype=np.uint64)
+
+'''
+Get the index array of every combination of size types out of n, cached since it only depends on n and size
+
+:param n: Number of types
+:type n: int
+:param size: Number of types in a combo
+:type size: int
+:return: Array of shape (number of combos, size), in itertools.combinations order
+:rtype: numpy.ndarray
+'''
+def combo_index_template(n, size):
+    np = import_numpy()
+    key = (n, size)
+    if key not in _combo_templates:
+        _combo_templates[key] = np.array(list(combinations(range(n), size)), dtype=np.intp).reshape(-1, size)
+    return _combo_templates[key]
+
+'''
+Score many combos at once. Each row of combo_idx holds the matrix rows of one combo's types
+
+:param row_masks: Packed super effective matrix from pack_se_matrix
+:type row_masks: numpy.ndarray
+:param combo_idx: Array of shape (number of combos, combo size)
+:type combo_idx: numpy.ndarray
+:return: Coverage bitmask words of each combo, and the number of types each covers
+:rtype: numpy.ndarray, numpy.ndarray
+'''
+def score_combos_numpy(row_masks, combo_idx):
+    np = import_numpy()
+    masks = np.bitwise_or.reduce(row_masks[combo_idx], axis=1)
+    if hasattr(np, "bitwise_count"):
+        lens = np.bitwise_count(masks).sum(axis=1, dtype=np.int64)
+    else:
+        lens = np.unpackbits(masks.view(np.uint8).reshape(len(masks), -1), axis=1).sum(axis=1)
+    return masks, lens
+
+'''
+Vectorized version of create_se_sets. Returns the same two dicts, but every combo is scored in one batch
+
+:param combos: Set of tuples representing type combos, like from get_type_combos
+:param type: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:return: Number of types covered to a list of combos, and combo to the set of types it covers
+:rtype: dict, dict
+'''
+def create_se_sets_numpy(combos, type_to_se_dict):
+    np = import_numpy()
+    combos = list(combos)
+    matrix, attackers, defenders = create_se_matrix(type_to_se_dict)
+    rows = {t: i for i, t in enumerate(attackers)}
+    combo_idx = np.array([[rows[t] for t in c] for c in combos], dtype=np.intp)
+    masks, lens = score_combos_numpy(pack_se_matrix(matrix), combo_idx)
+    if PROFILE is not None:
+        record_combos(len(combos))
+
+    # Many combos share the same coverage, so only turn each distinct mask into a set once
+    mask_to_se = {}
+    types_to_se = {}
+    se_lens = {}
+    masks = [sum(w << (64 * i) for i, w in enumerate(words)) for words in masks.tolist()]
+    for c, mask, n in zip(combos, masks, lens.tolist()):
+        if n in se_lens:
+            se_lens[n].append(c)
+        else:
+            se_lens[n] = [c]
+        if mask not in mask_to_se:
+            mask_to_se[mask] = mask_to_types(mask, defenders)
+        types_to_se[c] = set(mask_to_se[mask])
+
+    return se_lens, types_to_se
+
+'''
+Find the type combos that cover the most types, like get_best_combos but scored with NumPy
+Every combo is scored in one batch from the cached index template, and only the winning masks are turned into sets
+
+:param types: Set of types
+:type types: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:param size: Number of types in a combo
+:type size: int
+:return: List of the best combos in sorted order, and a dict of each of those combos to the set of types it covers
+:rtype: list, dict
+'''
+def get_best_combos_numpy(types, type_to_se_dict, size=4):
+    np = import_numpy()
+    types = sorted(types)
+    matrix, attackers, defenders = create_se_matrix(type_to_se_dict)
+    rows = {t: i for i, t in enumerate(attackers)}
+    template = combo_index_template(len(types), min(size, len(types)))
+    combo_idx = np.array([rows[t] for t in types], dtype=np.intp)[template]
+    masks, lens = score_combos_numpy(pack_se_matrix(matrix), combo_idx)
+    if PROFILE is not None:
+        record_combos(len(combo_idx))
+
+    max_combos = []
+    combos_to_se = {}
+    for i in np.flatnonzero(lens == lens.max()).tolist():
+        c = tuple(types[j] for j in template[i].tolist())
+        mask = sum(w << (64 * k) for k, w in enumerate(masks[i].tolist()))
+        max_combos.append(c)
+        combos_to_se[c] = mask_to_types(mask, defenders)
+    return max_combos, combos_to_se
+
+'''
+Find the type combos with the most coverage using the chosen engine
+
+:param move_types: Set of types
+:type move_types: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:param engine: "bitmask", "numpy" or "search"
+:type engine: str
+:param size: Number of types in a combo
+:type size: int
+:param top: If given, return this many combos in rank order instead of only the best ones. The engine is ignored
+:type top: int
+:param weights: Types to a tie-break score for top mode, see get_top_combos
+:type weights: dict
+:return: List of the best combos in sorted order, and a dict of combo to the set of types it covers
+:rtype: list, dict
+'''
+def get_max_combos(move_types, type_to_se_dict, engine="bitmask", size=4, top=None, weights=None):
+    if top:
+        return get_top_combos(move_types, type_to_se_dict, top, size, weights)
+    if engine == "numpy":
+        return get_best_combos_numpy(move_types, type_to_se_dict, size)
+    if engine == "search":
+        return search_best_combos(move_types, type_to_se_dict, size)
+    return get_best_combos(move_types, type_to_se_dict, size)
+
+'''
+Find the same combos as get_best_combos without trying every combination
+First the best coverage is found on a reduced set of types: types that cover nothing, or whose
+coverage is a subset of another type's, are dropped, and types with the same coverage are merged.
+Swapping a dropped type for the type that covers everything it does never lowers coverage,
+so the best coverage is the same. Then every combo of the original types that reaches it is found
+with branch and bound, skipping any branch that can't reach it
+
+:param types: Set of types
+:type types: set
+:param type_to_se_dict: Types to a set of types that the type is super effective against
+:type type_to_se_dict: dict
+:param size: Number of types in a combo
+:type size: int
+:param stats: If given, filled in with how many search nodes and full combos were looked at
+:type stats: dict
+:return: List of the best combos in sorted order, and a dict of each of those combos to the set of types it covers
+:rtype: list, dict
+'''
+def search_best_combos(types, type_to_se_dict, size=4, stats=None):
+    masks, defenders = create_type_masks(type_to_se_dict)
+    types = sorted(types)
+    if stats is None:
+        stats = {}
+    stats["nodes"] = 0
+    stats["combos"] = 0
+    if len(types) <= size:
+        c = tuple(types)
+        mask = 0
+        for t in c:
+            mask |= masks[t]
+        stats["combos"] = 1
+        return [c], {c: mask_to_types(mask, defenders)}
+
+    # Merge types with the same coverage, then drop empty and dominated ones
+    unique = sorted({masks[t] for t in types if masks[t]}, key=lambda m: -m.bit_count())
+    reduced = [m for m in unique if not any(m != other and m & other == m for other in unique)]
+
+    if len(reduced) <= size:
+        best_len = 0
+        for m in reduced:
+            best_len |= m
+        best_len = best_len.bit_count()
+    else:
+        best_len = branch_and_bound(reduced, size, 0, stats)[0]
+
+    # Every combo of the original types that reaches the best coverage, in itertools.combinations order
+    _, found = branch_and_bound([masks[t] for t in types], size, best_len, stats, collect=True)
+    if PROFILE is not None:
+        record_combos(stats["combos"])
+
+    max_combos = [tuple(types[i] for i in idx) for idx, _ in found]
+    combos_to_se = {c: mask_to_types(mask, defenders) for c, (_, mask) in zip(max_combos, found)}
+    return max_combos, combos_to_se
+
+'''
+Depth-first search over combos of masks, skipping branches whose upper bound is below the target
+The upper bound of a partial combo is its coverage plus the biggest new coverage each of the
+remaining picks could add on its own, which is never less than what they add together
+
+:param masks: Coverage bitmask of each type
+:type masks: list
+:param size: Number of types in a combo
+:type size: int
+:param target: Coverage to reach. Without collect, it's raised every time a better combo is found
+:type target: int
+:param stats: Counters for search nodes and full combos looked at
+:type stats: dict
+:param collect: If True, collect every combo that reaches target instead of finding the best one
+:type collect: bool
+:return: The best coverage found, and a list of (index tuple, mask) for the combos that reach it
+:rtype: int, list
+'''
+def branch_and_bound(masks, size, target, stats, collect=False):
+    n = len(masks)
+    found = []
+    best = [target]
+    chosen = []
+
+    def visit(start, cur):
+        stats["nodes"] += 1
+        need = size - len(chosen)
+        if need == 0:
+            stats["combos"] += 1
+            count = cur.bit_count()
+            if collect:
+                if count == best[0]:
+                    found.append((tuple(chosen), cur))
+            elif count > best[0]:
+                best[0] = count
+            return
+        if n - start < need:
+            return
+
+        gains = sorted(((m & ~cur).bit_count() for m in masks[start:]), reverse=True)
+        bound = cur.bit_count() + sum(gains[:need])
+        if bound < best[0] or (not collect and bound == best[0]):
+            return
+
+        for i in range(start, n - need + 1):
+            chosen.append(i)
+            visit(i + 1, cur | masks[i])
+            chosen.pop()
+
+    visit(0, 0)
+    return best[0], found
+
+'''
+Find every different coverage a Pokemon's move type combos can reach, with one combo for each
+Combos with the same coverage are merged. Combos whose coverage is a subset of another combo's are dropped,
+since swapping one for the bigger one never makes a team's coverage worse
+
+:param move_types: Set of types the Pokemon has damaging moves of
+:type move_types: set
+:param type_masks: Types to their coverage bitmask, from create_type_masks
+:type type_masks: dict
+:param size: Number of types in a combo
+:type size: int
+:return: Coverage bitmask to the first combo in ABC order that reaches it, biggest coverage first
+:rtype: dict
+'''
+def get_combo_masks(move_types, type_masks, size=4):
+    types = sorted(move_types)
+    if len(types) <= size:
+        combos = [tuple(types)]
+    else:
+        combos = combinations(types, size)
+
+    mask_to_combo = {}
+    for c in combos:
+        mask = 0
+        for t in c:
+            mask |= type_masks[t]
+        mask_to_combo.setdefault(mask, c)
+
+    kept = []
+    for mask in sorted(mask_to_combo, key=lambda m: -m.bit_count()):
+        if not any(mask & other == mask for other in kept):
+            kept.append(mask)
+    return {mask: mask_to_combo[mask] for mask in kept}
+
+'''
+Pick one coverage bitmask for each team member so the team covers as many types as possible,
+and then covers as many types as possible with at least two members
+Members are added one at a time while keeping every different (covered, covered twice) pair of bitmasks
+the team so far can reach. A pair is dropped if another pair covers everything it does on both bitmasks,
+or if it can't beat the greedy answer even when each later member covers everything it possibly can
+
+:param member_masks: For each member, a list of coverage bitmasks to choose from
+:type member_masks: list
+:return: The chosen bitmask for each member in the same order, the covered bitmask and the covered twice bitmask
+:rtype: list, int, int
+'''
+def solve_team(member_masks):
+    # Members with fewer choices go first so there are fewer pairs early on
+    order = sorted(range(len(member_masks)), key=lambda i: len(member_masks[i]))
+    choices = [member_masks[i] for i in order]
+
+    def score(once, twice):
+        return once.bit_count(), twice.bit_count()
+
+    # What the members after each point could cover at best, once and twice
+    later_once = [0] * (len(choices) + 1)
+    later_twice = [0] * (len(choices) + 1)
+    for i in range(len(choices) - 1, -1, -1):
+        union = 0
+        for mask in choices[i]:
+            union |= mask
+        later_twice[i] = later_twice[i + 1] | (later_once[i + 1] & union)
+        later_once[i] = later_once[i + 1] | union
+
+    # Greedy answer to beat: each member takes the mask that helps the team most right now
+    once = twice = 0
+    best_picks = []
+    for masks in choices:
+        mask = max(masks, key=lambda m: score(once | m, twice | (once & m)))
+        once, twice = once | mask, twice | (once & mask)
+        best_picks.append(mask)
+    best = score(once, twice)
+
+    states = {(0, 0): []}
+    for i, masks in enumerate(choices):
+        rest_once, rest_twice = later_once[i + 1], later_twice[i + 1]
+        next_states = {}
+        for (once, twice), picks in states.items():
+            for mask in masks:
+                key = (once | mask, twice | (once & mask))
+                if key in next_states:
+                    continue
+                if score(key[0] | rest_once, key[1] | (key[0] & rest_once) | rest_twice) <= best:
+                    continue
+                next_states[key] = picks + [mask]
+
+        # Drop pairs that another pair beats on both bitmasks
+        states = {}
+        for key in sorted(next_states, key=lambda k: (-k[0].bit_count(), -k[1].bit_count())):
+            if not any(key[0] & o == key[0] and key[1] & t == key[1] for o, t in states):
+                states[key] = next_states[key]
+
+    for key, picks in states.items():
+        if score(*key) > best:
+            best, best_picks = score(*key), picks
+
+    chosen = [0] * len(choices)
+    once = twice = 0
+    for i, mask in zip(order, best_picks):
+        chosen[i] = mask
+        once, twice = once | mask, twice | (once & mask)
+    return chosen, once, twice
+
+'''
+Get the generation number of a version, from the precompiled chart or by calling the API the first time
+
+:param version: Game version
+:type version: str
+:return: Generation number
+:rtype: int
+'''
+def get_version_gen(version):
+    with _batch_lock:
+        if version in _version_gens:
+            return _version_gens[version]
+    type_chart = load_type_chart()
+    if type_chart and version in type_chart["version_groups"]:
+        return type_chart["version_groups"][version]
+    gen = get_gen_num(get_generation(version))
+    with _batch_lock:
+        _version_gens[version] = gen
+    return gen
+
+'''
+Get the types in a generation and the super effective set of each, from the precompiled chart or by calling the API the first time
+
+:param gen: Integer generation number
+:type gen: int
+:return: Set of types in the generation, and types to the set of types they're super effective against
+:rtype: set, dict
+'''
+def get_gen_chart(gen):
+    with _batch_lock:
+        if gen in _gen_charts:
+            return _gen_charts[gen]
+    type_chart = load_type_chart()
+    if type_chart and gen in type_chart["generations"]:
+        return type_chart["generations"][gen]
+    types_in_gen = get_available_types(gen)
+    chart = (types_in_gen, create_type_to_se_dict(types_in_gen, gen))
+    with _batch_lock:
+        _gen_charts[gen] = chart
+    return chart
+
+'''
+Get the super effective set of each move type in a generation
+Move types outside the generation's chart (e.g. shadow moves) still need their own API lookup
+
+:param move_types: Set of types
+:type move_types: set
+:param gen: Integer generation number
+:type gen: int
+:return: Types to a set of types that the type is super effective against
+:rtype: dict
+'''
+def get_types_to_se(move_types, gen):
+    types_in_gen, chart = get_gen_chart(gen)
+    missing = move_types - set(chart)
+    types_to_se = {t: chart[t] for t in move_types - missing}
+    if missing:
+        types_to_se.update(create_type_to_se_dict(missing, gen, types_in_gen))
+    return types_to_se
+
+'''
+Get the damage multipliers of each type in a generation, from the precompiled chart or by calling the API the first time
+
+:param gen: Integer generation number
+:type gen: int
+:return: Types to a dict of defending type to multiplier
+:rtype: dict
+'''
+def get_gen_multipliers(gen):
+    with _batch_lock:
+        if gen in _gen_multipliers:
+            return _gen_multipliers[gen]
+    type_chart = load_type_chart()
+    if type_chart and gen in type_chart["multipliers"]:
+        return type_chart["multipliers"][gen]
+    types_in_gen, _ = get_gen_chart(gen)
+    multipliers = create_type_to_multipliers_dict(types_in_gen, gen)
+    with _batch_lock:
+        _gen_multipliers[gen] = multipliers
+    return multipliers
+
+'''
+Get every single and dual type a defending Pokemon can have. Dual types are written "type1/type2" in ABC order
+
+:param types: Types in the generation
+:type types: set
+:return: List of single types followed by every pair of types
+:rtype: list
+'''
+def get_dual_defenders(types):
+    types = sorted(types)
+    return types + [f"{a}/{b}" for a, b in combinations(types, 2)]
+
+'''
+Create a dictionary of attacking type to the single and dual types it's super effective against
+The multiplier against a dual type is the product of the multipliers against each of its types,
+so a 4x weakness counts but an immunity or resistance on the other type cancels a 2x
+
+:param move_types: Attacking types
+:type move_types: set
+:param move_multipliers: Attacking types to a dict of defending type to multiplier
+:type move_multipliers: dict
+:param defender_types: Types in the generation
+:type defender_types: set
+:return: Attacking types to a set of single and dual type names they're super effective against
+:rtype: dict
+'''
+def create_dual_se_dict(move_types, move_multipliers, defender_types):
+    defenders = [(d, d.split("/")) for d in get_dual_defenders(defender_types)]
+    type_to_se = {}
+    for t in move_types:
+        multipliers = move_multipliers[t]
+        se = set()
+        for name, parts in defenders:
+            multiplier = 1
+            for p in parts:
+                multiplier *= multipliers.get(p, 1)
+            if multiplier >= 2:
+                se.add(name)
+        type_to_se[t] = se
+    return type_to_se
+
+'''
+Get the dual type super effective sets of each move type in a generation
+
+:param move_types: Set of types
+:type move_types: set
+:param gen: Integer generation number
+:type gen: int
+:return: Types to a set of single and dual type names they're super effective against
+:rtype: dict
+'''
+def get_types_to_dual_se(move_types, gen):
+    types_in_gen, _ = get_gen_chart(gen)
+    gen_multipliers = get_gen_multipliers(gen)
+    missing = move_types - set(gen_multipliers)
+    move_multipliers = {t: gen_multipliers[t] for t in move_types - missing}
+    if missing:
+        move_multipliers.update(create_type_to_multipliers_dict(missing, gen, types_in_gen))
+    return create_dual_se_dict(move_types, move_multipliers, types_in_gen)
+
+'''
+Get the coverage bitmask of every type in a generation, made once and reused by every --lock query after that
+Move types outside the generation's chart are added to the cached masks the first time they show up
+
+:param gen: Integer generation number
+:type gen: int
+:param move_types: Set of types that need a mask
+:type move_types: set
+:param dual: If True, the masks are over every single and dual type instead of single types
+:type dual: bool
+:return: Types to bitmask, and the sorted list of defending types where index i is bit i
+:rtype: dict, list
+'''
+def get_gen_masks(gen, move_types, dual=False):
+    with _batch_lock:
+        cached = _gen_masks.get((gen, dual))
+    if cached is not None and move_types <= cached[0].keys():
+        return cached
+
+    types_in_gen, _ = get_gen_chart(gen)
+    types = set(types_in_gen) | set(move_types)
+    if cached is not None:
+        types |= cached[0].keys()
+    if dual:
+        cached = create_type_masks(get_types_to_dual_se(types, gen))
+    else:
+        cached = create_type_masks(get_types_to_se(types, gen))
+    with _batch_lock:
+        _gen_masks[(gen, dual)] = cached
+    return cached
+
+'''
+Build the precompiled type chart from PokeAPI and save it
+Every generation's types and super effective sets are resolved, including past damage relations.
+Relations against types that aren't in a generation yet are left out, the same as without a chart
+
+:param path: Where to save the chart
+:type path: str
+:return: The chart as saved, with lists in place of sets
+:rtype: dict
+'''
+def compile_type_chart(path=None):
+    path = path or TYPE_CHART_PATH
+    version_groups = {}
+    for v in get_valid_versions():
+        version_groups[v] = get_gen_num(get_generation(v))
+
+    generations = {}
+    n_gens = len(url_to_json("https://pokeapi.co/api/v2/generation")["results"])
+    for gen in range(1, n_gens + 1):
+        types = get_available_types(gen)
+        type_to_se = create_type_to_se_dict(types, gen)
+        type_to_multipliers = create_type_to_multipliers_dict(types, gen)
+        generations[str(gen)] = {
+            "types": sorted(types),
+            "super_effective": {t: sorted(type_to_se[t]) for t in sorted(type_to_se)},
+            "multipliers": type_to_multipliers,
+        }
+
+    chart = {"format": TYPE_CHART_FORMAT, "version_groups": version_groups, "generations": generations}
+    with open(path, "w") as f:
+        json.dump(chart, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+    global _type_chart
+    _type_chart = None
+    return chart
+
+'''
+Load the precompiled type chart, only reading the file the first time
+
+:return: Chart with "version_groups" (version to generation number), "generations"
+    (generation number to a tuple of the set of types and types to super effective sets) and "multipliers"
+    (generation number to types to damage multipliers), or None if there's no chart file or it's an old format
+:rtype: dict
+'''
+def load_type_chart():
+    global _type_chart
+    if _type_chart is None:
+        try:
+            with open(TYPE_CHART_PATH) as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            raw = {}
+        if raw.get("format") != TYPE_CHART_FORMAT:
+            _type_chart = False
+        else:
+            generations = {}
+            multipliers = {}
+            for gen, g in raw["generations"].items():
+                generations[int(gen)] = (set(g["types"]), {t: set(se) for t, se in g["super_effective"].items()})
+                multipliers[int(gen)] = g["multipliers"]
+            _type_chart = {"version_groups": raw["version_groups"], "generations": generations, "multipliers": multipliers}
+    return _type_chart or None
+
+'''
+Work out the best coverage for one Pokemon and version. The command line, batch mode and the server all use this
+
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:param version: Game version
+:type version: str
+:param versions: A list of game version names
+:type versions: list
+:param engine: "bitmask", "numpy" or "search"
+:type engine: str
+:param dual: If True, score coverage against every single and dual type instead of single types
+:type dual: bool
+:param size: Number of types in a combo
+:type size: int
+:param top: If given, list this many combos in rank order instead of only the best ones
+:type top: int
+:param lock: If given, only list combos that include all of these types
+:type lock: set
+:param progress: If given, called with a message as each step starts
+:type progress: function
+:return: Result with the move types, moves, and best combos with what they do and don't cover
+:rtype: dict
+'''
+def analyze_pokemon(pkmn_name, version, versions, engine="bitmask", dual=False, size=4, top=None, lock=None, progress=None):
+    progress = progress or (lambda message: None)
+    pkmn_name = pkmn_name.lower()
+    result = {"pokemon": pkmn_name, "version": version}
+    if version not in versions:
+        result["error"] = f"'{version}' is not a valid game version"
+        return result
+
+    progress("Getting list of available types in given version...")
+    with profile_stage("get_type_chart"):
+        gen = get_version_gen(version)
+        types_in_gen, _ = get_gen_chart(gen)
+
+    progress("Getting Pokemon information...")
+    with profile_stage("get_pkmn_json"):
+        pkmn_json = get_pkmn_json(pkmn_name)
+    result["generation"] = gen
+
+    progress("Getting moves information...")
+    # Smeargle is a special Pokemon that can copy almost all moves
+    if pkmn_name == "smeargle":
+        move_types = set(types_in_gen)
+        result["moves"] = None
+    else:
+        with profile_stage("classify_moves"):
+            types_to_moves_dict = classify_moves(pkmn_json, version)
+        move_types = set(types_to_moves_dict.keys())
+        result["moves"] = {}
+        for t, move in iter_moves(types_to_moves_dict):
+            result["moves"].setdefault(t, []).append(move)
+
+    result["move_types"] = sorted(move_types)
+    result["dual"] = dual
+    result["options"] = []
+    if lock and not set(lock) <= move_types:
+        result["error"] = f"'{pkmn_name}' can't learn damaging {', '.join(sorted(set(lock) - move_types))} moves in '{version}'"
+        return result
+    # In the case of no damaging moves found (Ditto, Wobbufett, etc.) there's nothing to cover
+    if not move_types:
+        return result
+
+    progress("Checking move types...")
+    # Check what each type combo covers super-effectively, then find the ones with most coverage
+    # In dual mode the defenders are every single and dual type, and immunities and resistances count
+    defenders = set(get_dual_defenders(types_in_gen)) if dual else types_in_gen
+    if lock:
+        with profile_stage("create_se_sets"):
+            max_combos, combos_to_se = get_locked_combos(move_types, lock, *get_gen_masks(gen, move_types, dual), size)
+    else:
+        with profile_stage("create_type_to_se_dict"):
+            types_to_se = get_types_to_dual_se(move_types, gen) if dual else get_types_to_se(move_types, gen)
+        # In top mode, coverage ties go to the combo with more learnable moves
+        weights = None if pkmn_name == "smeargle" else {t: len(types_to_moves_dict[t]) for t in move_types}
+        with profile_stage("create_se_sets"):
+            max_combos, combos_to_se = get_max_combos(move_types, types_to_se, engine, size, top, weights)
+    result["options"] = list(iter_options(max_combos, combos_to_se, defenders))
+    return result
+
+'''
+Find the move types each member of a team should use so the team covers as many types as possible together,
+and as many types as possible with at least two members
+
+:param pkmn_names: Names of up to 6 Pokemon
+:type pkmn_names: list
+:param version: Game version
+:type version: str
+:param versions: A list of game version names
+:type versions: list
+:param dual: If True, score coverage against every single and dual type instead of single types
+:type dual: bool
+:param size: Number of types in each member's combo
+:type size: int
+:return: Result with each member's combo and coverage, and what the team does and doesn't cover
+:rtype: dict
+'''
+def analyze_team(pkmn_names, version, versions, dual=False, size=4):
+    pkmn_names = [name.lower() for name in pkmn_names]
+    result = {"team": pkmn_names, "version": version}
+    if version not in versions:
+        result["error"] = f"'{version}' is not a valid game version"
+        return result
+
+    gen = get_version_gen(version)
+    types_in_gen, _ = get_gen_chart(gen)
+    result["generation"] = gen
+
+    member_types = []
+    for pkmn_name in pkmn_names:
+        pkmn_json = get_pkmn_json(pkmn_name)
+        # Smeargle is a special Pokemon that can copy almost all moves
+        if pkmn_name == "smeargle":
+            member_types.append(set(types_in_gen))
+        else:
+            with profile_stage("classify_moves"):
+                member_types.append(set(classify_moves(pkmn_json, version)))
+
+    all_types = set().union(*member_types)
+    if dual:
+        defenders = set(get_dual_defenders(types_in_gen))
+        types_to_se = get_types_to_dual_se(all_types, gen)
+    else:
+        defenders = types_in_gen
+        types_to_se = get_types_to_se(all_types, gen)
+
+    with profile_stage("solve_team"):
+        # The chart can list types from later generations, so only score the ones in this game
+        type_masks, mask_defenders = create_type_masks({t: se & defenders for t, se in types_to_se.items()})
+        member_combos = [get_combo_masks(move_types, type_masks, size) for move_types in member_types]
+        chosen, once, twice = solve_team([list(combos) for combos in member_combos])
+
+    result["members"] = []
+    for pkmn_name, move_types, combos, mask in zip(pkmn_names, member_types, member_combos, chosen):
+        result["members"].append({
+            "pokemon": pkmn_name,
+            "move_types": sorted(move_types),
+            "types": list(combos[mask]),
+            "covered": sorted(mask_to_types(mask, mask_defenders)),
+        })
+    covered = mask_to_types(once, mask_defenders)
+    result["covered"] = sorted(covered)
+    result["covered_twice"] = sorted(mask_to_types(twice, mask_defenders))
+    result["not_covered"] = sorted(defenders - covered)
+    return result
+
+'''
+Read batch jobs, one "pokemon version" pair per line. Commas also work as separators.
+Blank lines and lines starting with # are skipped.
+
+:param lines: Lines of the batch file
+:type lines: iterable
+:return: List of (pokemon, version) tuples. A line that isn't a pair is an {"input", "error"} dict instead
+:rtype: list
+'''
+def read_batch_jobs(lines):
+    jobs = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.replace(",", " ").split()
+        if len(parts) != 2:
+            # One bad line shouldn't stop the rest of the batch, it becomes that line's error
+            jobs.append({"input": line, "error": f"Batch line '{line}' should be 'pokemon version'"})
+            continue
+        jobs.append((parts[0], parts[1]))
+    return jobs
+
+'''
+Analyze many Pokemon at once and write each result as a JSON line as soon as it's done
+Results come out in the order they finish. Each has a "line" key with its position in the input.
+
+:param lines: Lines of the batch file
+:type lines: iterable
+:param versions: A list of game version names. Looked up if not given
+:type versions: list
+:param engine: "bitmask" or "numpy"
+:type engine: str
+:param workers: Number of Pokemon analyzed at the same time
+:type workers: int
+:param out: Where to write the results
+:type out: file
+:param dual: If True, score coverage against every single and dual type
+:type dual: bool
+:param size: Number of types in a combo
+:type size: int
+:param top: If given, list this many combos per Pokemon in rank order
+:type top: int
+:param lock: If given, only list combos that include all of these types
+:type lock: set
+'''
+def run_batch(lines, versions=None, engine="bitmask", workers=4, out=None, dual=False, size=4, top=None, lock=None):
+    import requests
+    import traceback
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    out = out or sys.stdout
+    jobs = read_batch_jobs(lines)
+    if versions is None:
+        versions = get_versions([job[1] for job in jobs if isinstance(job, tuple)])
+
+    def run_job(i, job):
+        if isinstance(job, dict):
+            return dict(job, line=i)
+        pkmn_name, version = job
+        try:
+            result = analyze_pokemon(pkmn_name, version, versions, engine, dual, size, top, lock)
+        except (SystemExit, requests.RequestException, ValueError) as e:
+            # get_pkmn_json and offline cache misses exit with a message, which becomes this job's error
+            result = {"pokemon": pkmn_name.lower(), "version": version, "error": str(e)}
+        except Exception as e:
+            # One broken job shouldn't stop the rest of the stream, so log it and keep going
+            traceback.print_exc()
+            result = {"pokemon": pkmn_name.lower(), "version": version, "error": f"Internal error: {e!r}"}
+        result["line"] = i
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run_job, i, job) for i, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            out.write(json.dumps(future.result()) + "\n")
+            out.flush()
+
+'''
+Create a local HTTP server that answers coverage queries from warm in-memory caches
+Each request runs on its own thread. Endpoints:
+    GET /coverage?pokemon=NAME&version=VERSION[&dual=1][&engine=numpy][&k=4][&top=N][&lock=TYPE,TYPE]  analyze_pokemon result as JSON
+    GET /stats  cache hit and miss counts
+
+:param host: Address to listen on
+:type host: str
+:param port: Port to listen on. 0 picks a free one
+:type port: int
+:return: The server. Call serve_forever() to start it
+:rtype: http.server.ThreadingHTTPServer
+'''
+def make_server(host="127.0.0.1", port=8765):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    class CoverageHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path == "/coverage":
+                status, body = handle_coverage_query(params)
+            elif url.path == "/stats":
+                with _cache_lock:
+                    status, body = 200, dict(CACHE_STATS, memory_entries=len(_memory_cache), learnsets=len(_learnset_indexes))
+            else:
+                status, body = 404, {"error": f"Unknown path '{url.path}'"}
+
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Keep the console quiet, one line per request is too much for tooling that calls this a lot
+            pass
+
+    server = ThreadingHTTPServer((host, port), CoverageHandler)
+    server.daemon_threads = True
+    return server
+
+'''
+Answer one /coverage query
+
+:param params: Query string parameters
+:type params: dict
+:return: HTTP status code and the JSON body
+:rtype: int, dict
+'''
+def handle_coverage_query(params):
+    import requests
+    import traceback
+    pkmn_name = params.get("pokemon")
+    version = params.get("version")
+    if not pkmn_name or not version:
+        return 400, {"error": "'pokemon' and 'version' are required"}
+    engine = params.get("engine", "bitmask")
+    if engine not in ("bitmask", "numpy", "search"):
+        return 400, {"error": f"Unknown engine '{engine}'"}
+    dual = params.get("dual", "").lower() in ("1", "true", "yes")
+    if not params.get("k", "4").isdigit() or int(params.get("k", "4")) < 1:
+        return 400, {"error": "'k' must be a positive whole number"}
+    size = int(params.get("k", "4"))
+    top = params.get("top")
+    if top is not None and (not top.isdigit() or int(top) < 1):
+        return 400, {"error": "'top' must be a positive whole number"}
+    top = int(top) if top else None
+    lock = parse_lock(params.get("lock", ""))
+    if len(lock) > size:
+        return 400, {"error": "'lock' can't have more types than 'k'"}
+    if lock and top:
+        return 400, {"error": "'lock' and 'top' can't be used together"}
+
+    try:
+        result = analyze_pokemon(pkmn_name, version, get_versions([version]), engine, dual, size, top, lock)
+    except SystemExit as e:
+        # get_pkmn_json and offline cache misses exit with a message
+        return 404, {"pokemon": pkmn_name.lower(), "version": version, "error": str(e)}
+    except (requests.RequestException, ValueError) as e:
+        # PokeAPI couldn't be reached or sent back something that isn't JSON
+        return 502, {"pokemon": pkmn_name.lower(), "version": version, "error": str(e)}
+    except Exception as e:
+        # A bug shouldn't drop the connection without an answer, so log it and say so
+        traceback.print_exc()
+        return 500, {"pokemon": pkmn_name.lower(), "version": version, "error": f"Internal error: {e!r}"}
+    if "error" in result:
+        return 400, result
+    return 200, result
+
+'''
+Get the name of every Pokemon, including alternate forms
+
+:return: List of Pokemon names in Pokedex order
+:rtype: list
+'''
+def get_species_names():
+    return [p["name"] for p in url_to_json("https://pokeapi.co/api/v2/pokemon?limit=100000")["results"]]
+
+'''
+Find the best coverage of a Pokemon in every version group it has moves in
+
+:param pkmn_name: Name of Pokemon
+:type pkmn_name: str
+:param versions: A list of game version names
+:type versions: list
+:return: One entry per version group with the generation, the Pokemon's move types, the types in the generation
+    and the best combos with what they cover
+:rtype: list
+'''
+def index_pokemon(pkmn_name, versions):
+    learnable = get_learnset_index(get_pkmn_json(pkmn_name))["versions"]
+    entries = []
+    for version in versions:
+        if version not in learnable:
+            continue
+        result = analyze_pokemon(pkmn_name, version, versions)
+        types_in_gen, _ = get_gen_chart(result["generation"])
+        entries.append({
+            "version": version,
+            "generation": result["generation"],
+            "move_types": result["move_types"],
+            "types_in_gen": sorted(types_in_gen),
+            "options": [[option["types"], option["covered"]] for option in result["options"]],
+        })
+    return entries
+
+'''
+Index one shard of Pokemon, adding a line to the shard file as each one finishes so a stopped build can resume.
+Runs in a worker process, so the cache settings and API address are passed in
+
+:param job: Shard file path, list of Pokemon names, list of game version names and the cache settings
+:type job: tuple
+:return: Number of Pokemon indexed
+:rtype: int
+'''
+def build_index_shard(job):
+    import requests
+    global API_BASE, _cache_db, _session
+    shard_path, pkmn_names, versions, settings = job
+    # A forked worker must not use the parent's database connection or HTTP connections
+    _cache_db = None
+    _session = None
+    API_BASE = settings.pop("api_base")
+    configure_backend(settings.pop("backend"), settings.pop("graphql_url"))
+    configure_mirror(settings.pop("mirror"))
+    configure_cache(**settings)
+
+    done = 0
+    with open(shard_path, "a") as f:
+        for pkmn_name in pkmn_names:
+            try:
+                entries = index_pokemon(pkmn_name, versions)
+            except (SystemExit, requests.RequestException) as e:
+                # Left out of the shard file, so it's tried again when the build is resumed
+                print(f"Skipping {pkmn_name}: {e}", file=sys.stderr)
+                continue
+            f.write(json.dumps({"pokemon": pkmn_name, "entries": entries}) + "\n")
+            f.flush()
+            done += 1
+    return done
+
+'''
+Read every Pokemon finished so far from the shard files of an index build.
+A line cut off by a stopped build is ignored
+
+:param parts_dir: Folder with the shard files
+:type parts_dir: str
+:return: Pokemon name to its index entries
+:rtype: dict
+'''
+def read_index_shards(parts_dir):
+    finished = {}
+    if not os.path.isdir(parts_dir):
+        return finished
+    for name in sorted(os.listdir(parts_dir)):
+        with open(os.path.join(parts_dir, name)) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                finished[row["pokemon"]] = row["entries"]
+    return finished
+
+'''
+Build the precomputed coverage index for every Pokemon in every version group it's in.
+Pokemon are split into shards that run in separate processes. Finished Pokemon are saved in a
+"FILE.parts" folder, so running the build again after it stops only does the rest
+
+:param path: Where to write the index
+:type path: str
+:param workers: Number of processes. With 1, everything runs in this process
+:type workers: int
+:param pkmn_names: Pokemon to index, every Pokemon if not given
+:type pkmn_names: list
+:return: Number of records written
+:rtype: int
+'''
+def build_index(path, workers=4, pkmn_names=None):
+    versions = get_versions()
+    if pkmn_names is None:
+        pkmn_names = get_species_names()
+
+    parts_dir = path + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    finished = read_index_shards(parts_dir)
+    todo = [name for name in pkmn_names if name not in finished]
+    if finished:
+        print(f"Resuming: {len(finished)} Pokemon already indexed, {len(todo)} to go")
+
+    global _cache_db
+    if _cache_db is not None:
+        # Workers open their own connections, don't fork with this one open
+        _cache_db.close()
+        _cache_db = None
+    settings = {"path": CACHE_PATH, "ttl": CACHE_TTL, "max_entries": CACHE_MAX_ENTRIES, "offline": OFFLINE, "enabled": CACHE_ENABLED,
+                "api_base": API_BASE, "backend": LEARNSET_BACKEND, "graphql_url": GRAPHQL_URL, "mirror": MIRROR_DIR}
+    # Each run appends to its own shard files, so a resumed build never writes into a cut off line
+    run_id = len(os.listdir(parts_dir))
+    workers = max(1, min(workers, len(todo)))
+    jobs = [(os.path.join(parts_dir, f"shard-{run_id + i}.jsonl"), todo[i::workers], versions, dict(settings)) for i in range(workers)] if todo else []
+    if len(jobs) == 1:
+        build_index_shard(jobs[0])
+    elif jobs:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(build_index_shard, jobs))
+
+    finished = read_index_shards(parts_dir)
+    missing = [name for name in pkmn_names if name not in finished]
+    if missing:
+        sys.exit(f"{len(missing)} Pokemon couldn't be indexed. Run the same command again to retry them")
+
+    n_records = write_index(path, {name: finished[name] for name in pkmn_names})
+    for name in os.listdir(parts_dir):
+        os.remove(os.path.join(parts_dir, name))
+    os.rmdir(parts_dir)
+    return n_records
+
+'''
+Write the index file from each Pokemon's entries. The file is written next to the old one and then swapped in,
+so lookups never see a half written index
+
+:param path: Where to write the index
+:type path: str
+:param pkmn_entries: Pokemon name to the list of entries from index_pokemon
+:type pkmn_entries: dict
+:return: Number of records written
+:rtype: int
+'''
+def write_index(path, pkmn_entries):
+    types = set()
+    rows = []
+    for pkmn_name, entries in pkmn_entries.items():
+        for entry in entries:
+            types.update(entry["types_in_gen"], entry["move_types"], *(covered for _, covered in entry["options"]))
+            key = f"{pkmn_name}/{entry['version']}".encode()
+            if len(key) > INDEX_KEY_WIDTH:
+                sys.exit(f"Index key '{key.decode()}' is longer than {INDEX_KEY_WIDTH} characters")
+            rows.append((key, entry))
+    types = sorted(types)
+    if len(types) > 32:
+        sys.exit("The index only has room for 32 types")
+    bits = {t: 1 << i for i, t in enumerate(types)}
+
+    def to_mask(names):
+        mask = 0
+        for t in names:
+            mask |= bits[t]
+        return mask
+
+    rows.sort(key=lambda row: row[0])
+    records_offset = INDEX_HEADER.size + INDEX_TYPE_WIDTH * len(types)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FORMAT, len(types), INDEX_OPTIONS, INDEX_KEY_WIDTH, len(rows), records_offset))
+        for t in types:
+            f.write(t.encode().ljust(INDEX_TYPE_WIDTH, b"\0"))
+        for _, entry in rows:
+            pairs = []
+            for combo, covered in entry["options"][:INDEX_OPTIONS]:
+                pairs += [to_mask(combo), to_mask(covered)]
+            pairs += [0] * (2 * INDEX_OPTIONS - len(pairs))
+            n_stored = min(len(entry["options"]), INDEX_OPTIONS)
+            f.write(INDEX_RECORD.pack(entry["generation"], n_stored, len(entry["options"]), to_mask(entry["move_types"]), to_mask(entry["types_in_gen"]), *pairs))
+        for key, _ in rows:
+            f.write(key.ljust(INDEX_KEY_WIDTH, b"\0"))
+    os.replace(tmp_path, path)
+    return len(rows)
+
+'''
+Open an index file with mmap, only opening each file the first time
+
+:param path: Index file path
+:type path: str
+:return: The mapped file, the header values and the type names in bit order
+:rtype: mmap.mmap, tuple, list
+'''
+def open_index(path):
+    with _index_lock:
+        if path in _indexes:
+            return _indexes[path]
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = INDEX_HEADER.unpack_from(mm, 0)
+        magic, file_format, n_types, options, key_width, n_records, records_offset = header
+        if magic != INDEX_MAGIC or file_format != INDEX_FORMAT or options != INDEX_OPTIONS or key_width != INDEX_KEY_WIDTH:
+            sys.exit(f"'{path}' isn't a coverage index made by this version of the program. Rebuild it with --build-index")
+        types = [mm[INDEX_HEADER.size + i * INDEX_TYPE_WIDTH:INDEX_HEADER.size + (i + 1) * INDEX_TYPE_WIDTH].rstrip(b"\0").decode() for i in range(n_types)]
+        _indexes[path] = (mm, header, types)
+        return _indexes[path]
+
+'''
+Look up a Pokemon's best coverage in a version group from the index, with a binary search over the keys
+
+:param path: Index file path
+:type path: str
+:param pkmn_name: Name of Pokemon, any case. It's checked with resolve_pkmn_name like any other query
+:type pkmn_name: str
+:param version: Game version
+:type version: str
+:except SystemExit: If the name isn't a Pokemon, with suggestions in the message
+:return: Result in the same shape as analyze_pokemon without the moves, or None if it isn't in the index.
+    "total_options" is how many combos tie for best, only the first INDEX_OPTIONS are listed
+:rtype: dict
+'''
+def lookup_index(path, pkmn_name, version):
+    mm, header, types = open_index(path)
+    _, _, _, _, key_width, n_records, records_offset = header
+    # Records are stored under the names the API uses, so a species name needs its default form
+    pkmn_name = resolve_pkmn_name(pkmn_name)
+    key = f"{pkmn_name}/{version}".encode().ljust(key_width, b"\0")
+    keys_offset = records_offset + n_records * INDEX_RECORD.size
+
+    lo, hi = 0, n_records
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = keys_offset + mid * key_width
+        if mm[start:start + key_width] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    start = keys_offset + lo * key_width
+    if lo == n_records or mm[start:start + key_width] != key:
+        return None
+
+    gen, n_stored, n_options, move_mask, gen_mask, *pairs = INDEX_RECORD.unpack_from(mm, records_offset + lo * INDEX_RECORD.size)
+    in_gen = mask_to_types(gen_mask, types)
+    options = []
+    for i in range(n_stored):
+        covered = mask_to_types(pairs[2 * i + 1], types)
+        options.append({
+            "types": sorted(mask_to_types(pairs[2 * i], types)),
+            "covered": sorted(covered),
+            "not_covered": sorted(in_gen - covered),
+        })
+    return {
+        "pokemon": pkmn_name,
+        "version": version,
+        "generation": gen,
+        "move_types": sorted(mask_to_types(move_mask, types)),
+        "options": options,
+        "total_options": n_options,
+    }
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
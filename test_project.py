@@ -1,4 +1,44 @@
+import benchmark
+import io
+import json
+import os
 import project
+import pytest
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+@pytest.fixture(autouse=True)
+def temp_cache(monkeypatch, tmp_path):
+    # Every test gets its own empty response cache, so tests never pass from stale data in the real one or write to it.
+    # PKMN_CACHE does the same for tests that run project.py in another process
+    monkeypatch.setattr(project, "_cache_db", None)
+    monkeypatch.setattr(project, "CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setenv("PKMN_CACHE", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(project, "CACHE_ENABLED", True)
+    monkeypatch.setattr(project, "OFFLINE", False)
+    monkeypatch.setattr(project, "CACHE_STATS", {"hits": 0, "misses": 0, "evictions": 0, "memory_hits": 0})
+    monkeypatch.setattr(project, "_memory_cache", project.OrderedDict())
+    yield
+    if project._cache_db is not None:
+        project._cache_db.close()
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    # benchmark's stand-in PokeAPI server with the synthetic fixtures, and API requests pointed at it.
+    # Tests can add files to its fixture_dir, since files are read when they're requested
+    fixture_dir = str(tmp_path / "fixtures")
+    benchmark.write_synthetic_fixtures(fixture_dir)
+    server = benchmark.start_stand_in(fixture_dir)
+    server.fixture_dir = fixture_dir
+    monkeypatch.setattr(project, "API_BASE", server.api_base)
+    yield server
+    server.shutdown()
+    server.server_close()
 
 def test_get_move_type():
     thunder_punch = project.url_to_json("https://pokeapi.co/api/v2/move/9/")
@@ -67,4 +107,708 @@ def test_get_available_types():
     # Gen 6 introduces fairy type
     assert(project.get_available_types(6)) == {"normal", "fighting", "flying", "poison", "ground", "rock", "bug", "ghost", "fire", "water", "grass", "electric", "psychic", "ice", "dragon", "dark", "steel", "fairy"}
     # Gen 7 doesn't introduce any types. Should match Gen 6
-    assert(project.get_available_types(7)) == {"normal", "fighting", "flying", "poison", "ground", "rock", "bug", "ghost", "fire", "water", "grass", "electric", "psychic", "ice", "dragon", "dark", "steel", "fairy"}
\ No newline at end of file
+    assert(project.get_available_types(7)) == {"normal", "fighting", "flying", "poison", "ground", "rock", "bug", "ghost", "fire", "water", "grass", "electric", "psychic", "ice", "dragon", "dark", "steel", "fairy"}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+def test_url_to_json_cache(monkeypatch):
+    # Only the SQLite cache is counted here
+    monkeypatch.setattr(project, "MEMORY_CACHE_SIZE", 0)
+    calls = []
+    monkeypatch.setattr(project, "http_get", lambda url: calls.append(url) or FakeResponse({"url": url}))
+
+    assert project.url_to_json("https://pokeapi.co/api/v2/type/ghost/") == {"url": "https://pokeapi.co/api/v2/type/ghost/"}
+    # Same resource without the trailing slash should be a cache hit
+    assert project.url_to_json("https://pokeapi.co/api/v2/type/ghost") == {"url": "https://pokeapi.co/api/v2/type/ghost/"}
+    assert len(calls) == 1
+    assert project.CACHE_STATS["hits"] == 1
+    assert project.CACHE_STATS["misses"] == 1
+
+    # Offline mode serves cached data and exits on a miss
+    monkeypatch.setattr(project, "OFFLINE", True)
+    assert project.url_to_json("https://pokeapi.co/api/v2/type/ghost")["url"].endswith("ghost/")
+    try:
+        project.url_to_json("https://pokeapi.co/api/v2/type/dark")
+        assert False
+    except SystemExit:
+        pass
+    assert len(calls) == 1
+    project._cache_db.close()
+
+def test_cache_eviction(monkeypatch, tmp_path):
+    monkeypatch.setattr(project, "CACHE_MAX_ENTRIES", 2)
+    project.cache_put("https://pokeapi.co/api/v2/type/1", {"id": 1})
+    project.cache_put("https://pokeapi.co/api/v2/type/2", {"id": 2})
+    # Make type 2 the least recently used entry
+    project._cache_db.execute("UPDATE responses SET used = used - 10 WHERE url LIKE '%/2'")
+    project.cache_put("https://pokeapi.co/api/v2/type/3", {"id": 3})
+
+    assert project.cache_get("https://pokeapi.co/api/v2/type/1") == {"id": 1}
+    assert project.cache_get("https://pokeapi.co/api/v2/type/2") is None
+    assert project.cache_get("https://pokeapi.co/api/v2/type/3") == {"id": 3}
+    assert project.CACHE_STATS["evictions"] == 1
+
+    # A cache hit doesn't write to the database, but its use is saved before the next eviction
+    monkeypatch.setattr(project, "_cache_used", {})
+    project._cache_db.execute("UPDATE responses SET used = used - 20 WHERE url LIKE '%/1'")
+    project._cache_db.execute("UPDATE responses SET used = used - 10 WHERE url LIKE '%/3'")
+    project._cache_db.commit()
+    assert project.cache_get("https://pokeapi.co/api/v2/type/1") == {"id": 1}
+    assert not project._cache_db.in_transaction
+    project.cache_put("https://pokeapi.co/api/v2/type/4", {"id": 4})
+    assert project.cache_get("https://pokeapi.co/api/v2/type/3") is None
+    assert project.cache_get("https://pokeapi.co/api/v2/type/1") == {"id": 1}
+
+    # Reopening the database doesn't register another exit handler
+    registered = []
+    monkeypatch.setattr(project.atexit, "register", registered.append)
+    project.configure_cache(path=str(tmp_path / "other.sqlite3"))
+    project.cache_put("https://pokeapi.co/api/v2/type/5", {"id": 5})
+    assert registered == []
+    project._cache_db.close()
+
+def fake_move(name, url, version, method="level-up", level=1):
+    return {
+        "move": {"name": name, "url": url},
+        "version_group_details": [{"version_group": {"name": version}, "move_learn_method": {"name": method}, "level_learned_at": level}],
+    }
+
+def test_classify_moves_parallel(monkeypatch):
+    moves = {
+        "https://pokeapi.co/api/v2/move/1/": {"type": {"name": "normal"}, "power": 40},
+        "https://pokeapi.co/api/v2/move/2/": {"type": {"name": "normal"}, "power": 80},
+        "https://pokeapi.co/api/v2/move/3/": {"type": {"name": "fire"}, "power": 90},
+        "https://pokeapi.co/api/v2/move/4/": {"type": {"name": "normal"}, "power": None},
+    }
+    fetched = []
+    def fake_url_to_json(url):
+        # Finish the first move last to make sure results still come back in learnset order
+        if url.endswith("/1/"):
+            time.sleep(0.05)
+        fetched.append(url)
+        return moves[url]
+    monkeypatch.setattr(project, "url_to_json", fake_url_to_json)
+
+    pkmn = {"moves": [
+        fake_move("pound", "https://pokeapi.co/api/v2/move/1/", "emerald"),
+        fake_move("slam", "https://pokeapi.co/api/v2/move/2/", "emerald", "machine"),
+        fake_move("ember", "https://pokeapi.co/api/v2/move/3/", "red-blue"),
+        fake_move("growl", "https://pokeapi.co/api/v2/move/4/", "emerald"),
+    ]}
+    assert project.classify_moves(pkmn, "emerald") == {"normal": [project.Move("Pound", 1, "Level-Up"), project.Move("Slam", "N/A", "Machine")]}
+    # Ember isn't learnable in emerald so it's never fetched
+    assert sorted(fetched) == ["https://pokeapi.co/api/v2/move/1/", "https://pokeapi.co/api/v2/move/2/", "https://pokeapi.co/api/v2/move/4/"]
+
+# Small made-up type chart so coverage tests don't need the API
+TYPE_CHART = {
+    "fire": {"grass", "ice", "bug", "steel"},
+    "water": {"fire", "ground", "rock"},
+    "grass": {"water", "ground", "rock"},
+    "electric": {"water", "flying"},
+    "ice": {"grass", "ground", "flying", "dragon"},
+    "normal": set(),
+}
+
+def test_get_best_combos():
+    len_to_combos, combos_to_se = project.create_se_sets(project.get_type_combos(set(TYPE_CHART)), TYPE_CHART)
+    expected = {tuple(sorted(c)) for c in len_to_combos[max(len_to_combos)]}
+
+    max_combos, best_to_se = project.get_best_combos(set(TYPE_CHART), TYPE_CHART)
+    assert set(max_combos) == expected
+    assert max_combos == sorted(max_combos)
+    for c in max_combos:
+        assert best_to_se[c] == project.create_se_set(c, TYPE_CHART)
+
+    # Fewer types than move slots gives back the one combo
+    assert project.get_best_combos({"normal", "fire"}, TYPE_CHART) == ([("fire", "normal")], {("fire", "normal"): TYPE_CHART["fire"]})
+
+def test_create_se_sets_numpy():
+    pytest.importorskip("numpy")
+    combos = project.get_type_combos(set(TYPE_CHART))
+    assert project.create_se_sets_numpy(combos, TYPE_CHART) == project.create_se_sets(combos, TYPE_CHART)
+
+    # The numpy engine finds the same best combos as the bitmask one, for any combo size
+    for size in (1, 2, 4, 10):
+        assert project.get_best_combos_numpy(set(TYPE_CHART), TYPE_CHART, size) == project.get_best_combos(set(TYPE_CHART), TYPE_CHART, size)
+
+def test_run_batch(monkeypatch):
+    monkeypatch.setattr(project, "get_version_gen", lambda version: 3)
+    monkeypatch.setattr(project, "get_gen_chart", lambda gen: (set(TYPE_CHART), TYPE_CHART))
+    def fake_pkmn_json(name):
+        if name == "missingno":
+            sys.exit(f"Pokemon named '{name}' not found.")
+        if name == "broken":
+            raise KeyError("moves")
+        return {"name": name}
+    monkeypatch.setattr(project, "get_pkmn_json", fake_pkmn_json)
+    monkeypatch.setattr(project, "classify_moves", lambda pkmn_json, version: {"fire": [project.Move("Ember", 1, "Level-Up")]} if pkmn_json["name"] == "charmander" else {})
+
+    lines = ["# pokemon version", "charmander emerald", "", "ditto,emerald", "MissingNo red-blue", "smeargle emerald", "pikachu not-a-version", "broken emerald", "bulbasaur", "squirtle emerald"]
+    out = io.StringIO()
+    project.run_batch(lines, ["emerald", "red-blue"], workers=2, out=out)
+    results = sorted((json.loads(l) for l in out.getvalue().splitlines()), key=lambda r: r["line"])
+
+    assert [r.get("pokemon") for r in results] == ["charmander", "ditto", "missingno", "smeargle", "pikachu", "broken", None, "squirtle"]
+    assert results[0]["moves"] == {"fire": [["Ember", 1, "Level-Up"]]}
+    assert results[0]["options"] == [{"types": ["fire"], "covered": ["bug", "grass", "ice", "steel"], "not_covered": ["electric", "fire", "normal", "water"]}]
+    assert results[1]["options"] == []
+    assert "not found" in results[2]["error"]
+    assert results[3]["moves"] is None and len(results[3]["options"][0]["types"]) == 4
+    assert "not a valid game version" in results[4]["error"]
+    # Any other error only fails its own line
+    assert "KeyError" in results[5]["error"]
+    # So does a line that isn't a "pokemon version" pair
+    assert results[6] == {"input": "bulbasaur", "error": "Batch line 'bulbasaur' should be 'pokemon version'", "line": 6}
+    assert results[7]["options"] == []
+
+def test_compile_type_chart(monkeypatch, tmp_path):
+    monkeypatch.setattr(project, "TYPE_CHART_PATH", str(tmp_path / "type_chart.json"))
+    monkeypatch.setattr(project, "_type_chart", None)
+    monkeypatch.setattr(project, "_version_gens", {})
+    monkeypatch.setattr(project, "_gen_charts", {})
+    monkeypatch.setattr(project, "get_valid_versions", lambda: ["red-blue", "gold-silver"])
+    monkeypatch.setattr(project, "get_generation", lambda v: "generation-i" if v == "red-blue" else "generation-ii")
+    monkeypatch.setattr(project, "url_to_json", lambda url: {"results": [{}, {}]})
+    monkeypatch.setattr(project, "get_available_types", lambda gen: {"ghost", "psychic"} if gen == 1 else {"ghost", "psychic", "dark"})
+    monkeypatch.setattr(project, "create_type_to_se_dict", lambda types, gen: {t: {"ghost"} if t == "ghost" and gen == 1 else {"ghost", "psychic"} for t in types})
+    monkeypatch.setattr(project, "create_type_to_multipliers_dict", lambda types, gen: {t: {"ghost": 2} for t in types})
+    project.compile_type_chart()
+
+    # Once compiled, lookups come from the file without any API calls
+    def no_api(*args):
+        raise AssertionError("API called")
+    for name in ["get_generation", "url_to_json", "get_available_types", "create_type_to_se_dict", "create_type_to_multipliers_dict"]:
+        monkeypatch.setattr(project, name, no_api)
+    assert project.get_version_gen("gold-silver") == 2
+    assert project.get_gen_chart(1) == ({"ghost", "psychic"}, {"ghost": {"ghost"}, "psychic": {"ghost", "psychic"}})
+    assert project.get_types_to_se({"ghost", "dark"}, 2) == {"ghost": {"ghost", "psychic"}, "dark": {"ghost", "psychic"}}
+    assert project.get_types_to_dual_se({"dark"}, 2)["dark"] == {"ghost", "dark/ghost", "ghost/psychic"}
+
+def test_bundled_type_chart(monkeypatch):
+    # The chart shipped next to project.py answers every version and type question without the API
+    monkeypatch.setattr(project, "TYPE_CHART_PATH", os.path.join(os.path.dirname(os.path.abspath(project.__file__)), "type_chart.json"))
+    project.clear_memory_caches()
+    def no_api(*args):
+        raise AssertionError("API called")
+    for name in ["get_valid_versions", "get_generation", "url_to_json", "get_available_types", "create_type_to_se_dict", "create_type_to_multipliers_dict"]:
+        monkeypatch.setattr(project, name, no_api)
+    try:
+        versions = project.get_versions(["red-blue", "emerald", "scarlet-violet"])
+        assert [project.get_version_gen(v) for v in ("red-blue", "gold-silver", "emerald", "x-y", "scarlet-violet")] == [1, 2, 3, 6, 9]
+        assert "the-indigo-disk" in versions
+        assert [len(project.get_gen_chart(gen)[0]) for gen in range(1, 10)] == [15, 17, 17, 17, 17, 18, 18, 18, 18]
+
+        # Damage relations changed over the generations
+        assert project.get_gen_chart(1)[1]["ghost"] == {"ghost"}
+        assert project.get_gen_chart(1)[1]["bug"] == {"grass", "poison", "psychic"}
+        assert project.get_gen_chart(3)[1]["ghost"] == {"ghost", "psychic"}
+        assert project.get_gen_chart(9)[1]["poison"] == {"grass", "fairy"}
+        assert project.get_gen_multipliers(1)["ghost"]["psychic"] == 0
+        assert project.get_gen_multipliers(5)["dark"]["steel"] == 0.5
+        assert "steel" not in project.get_gen_multipliers(6)["dark"]
+    finally:
+        project.clear_memory_caches()
+
+def test_compiled_chart_matches_bundled(monkeypatch, tmp_path, stand_in):
+    # Compiling from PokeAPI-shaped type data gives the shipped chart, and so does asking without a chart
+    with open(os.path.join(os.path.dirname(os.path.abspath(project.__file__)), "type_chart.json")) as f:
+        bundled = json.load(f)
+    monkeypatch.setattr(project, "TYPE_CHART_PATH", str(tmp_path / "type_chart.json"))
+    project.clear_memory_caches()
+    try:
+        compiled = json.loads(json.dumps(project.compile_type_chart()))
+        assert compiled["version_groups"] == bundled["version_groups"]
+        assert compiled["generations"].keys() == bundled["generations"].keys()
+        for gen, chart in bundled["generations"].items():
+            assert compiled["generations"][gen] == chart, gen
+
+        monkeypatch.setattr(project, "TYPE_CHART_PATH", str(tmp_path / "no_chart.json"))
+        project.clear_memory_caches()
+        for gen, chart in bundled["generations"].items():
+            types, se = project.get_gen_chart(int(gen))
+            assert types == set(chart["types"])
+            assert {t: sorted(s) for t, s in se.items()} == chart["super_effective"], gen
+    finally:
+        project.clear_memory_caches()
+
+# Cached queries should print their first line well within this many seconds
+STARTUP_BUDGET = 1.0
+
+def test_import_is_light():
+    out = subprocess.run([sys.executable, "-c", "import project, sys; print(sorted(m for m in ['requests', 'tabulate', 'roman', 'numpy'] if m in sys.modules))"],
+                         capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(project.__file__)))
+    assert out.stdout.strip() == "[]"
+
+def test_cached_query_startup(monkeypatch, tmp_path):
+    # Fill a temp cache with one Pokemon and its moves, and write a small precompiled chart
+    pkmn = {"moves": [
+        fake_move("ember", "https://pokeapi.co/api/v2/move/52/", "emerald"),
+        fake_move("water-gun", "https://pokeapi.co/api/v2/move/55/", "emerald"),
+    ]}
+    project.cache_put("https://pokeapi.co/api/v2/pokemon/testmon", pkmn)
+    project.cache_put("https://pokeapi.co/api/v2/move/52/", {"type": {"name": "fire"}, "power": 40})
+    project.cache_put("https://pokeapi.co/api/v2/move/55/", {"type": {"name": "water"}, "power": 40})
+    project._cache_db.close()
+    chart = {"format": project.TYPE_CHART_FORMAT, "version_groups": {"emerald": 3},
+             "generations": {"3": {"types": sorted(TYPE_CHART), "super_effective": {t: sorted(se) for t, se in TYPE_CHART.items()}, "multipliers": {}}}}
+    (tmp_path / "type_chart.json").write_text(json.dumps(chart))
+
+    env = dict(os.environ, PKMN_CACHE=str(tmp_path / "cache.sqlite3"), PKMN_TYPE_CHART=str(tmp_path / "type_chart.json"))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, project.__file__, "-p", "testmon", "-v", "emerald", "--offline"], stdout=subprocess.PIPE, text=True, env=env)
+    first_line = proc.stdout.readline()
+    first_output = time.perf_counter() - start
+    rest = proc.stdout.read()
+    proc.wait()
+
+    assert proc.returncode == 0
+    assert first_line.startswith("Getting")
+    assert "fire, water" in rest
+    assert first_output < STARTUP_BUDGET
+
+def test_create_dual_se_dict():
+    multipliers = {
+        "ground": {"fire": 2, "electric": 2, "flying": 0, "grass": 0.5},
+        "ice": {"grass": 2, "flying": 2, "fire": 0.5},
+    }
+    types = {"fire", "electric", "flying", "grass"}
+    assert len(project.get_dual_defenders(types)) == 4 + 6
+    dual = project.create_dual_se_dict({"ground", "ice"}, multipliers, types)
+    # Flying's immunity cancels ground's 2x against fire and electric, and grass resists it
+    assert dual["ground"] == {"fire", "electric", "electric/fire"}
+    # 4x against flying/grass, but fire resists ice
+    assert dual["ice"] == {"grass", "flying", "flying/grass", "electric/flying", "electric/grass"}
+
+    max_combos, combos_to_se = project.get_max_combos({"ground", "ice"}, dual)
+    assert max_combos == [("ground", "ice")]
+    assert len(combos_to_se[("ground", "ice")]) == 8
+
+def test_numpy_dual_defenders():
+    pytest.importorskip("numpy")
+    # 18 types have 171 single and dual types, more than fit in one 64 bit word
+    types = [f"type{i}" for i in range(18)]
+    defenders = project.get_dual_defenders(types)
+    chart = {t: {d for j, d in enumerate(defenders) if j % (i + 2) == 0} for i, t in enumerate(types[:8])}
+    combos = project.get_type_combos(set(chart))
+    assert project.create_se_sets_numpy(combos, chart) == project.create_se_sets(combos, chart)
+    assert project.get_best_combos_numpy(set(chart), chart) == project.get_best_combos(set(chart), chart)
+
+def test_learnset_index(monkeypatch):
+    monkeypatch.setattr(project, "_learnset_indexes", project.OrderedDict())
+    fetched = []
+    def fake_url_to_json(url):
+        fetched.append(url)
+        return {"type": {"name": "fire"}, "power": 40}
+    monkeypatch.setattr(project, "url_to_json", fake_url_to_json)
+
+    ember = fake_move("ember", "https://pokeapi.co/api/v2/move/52/", "emerald")
+    ember["version_group_details"].append({"version_group": {"name": "red-blue"}, "move_learn_method": {"name": "machine"}, "level_learned_at": 0})
+    pkmn = {"name": "charmander", "moves": [ember]}
+
+    index = project.build_learnset_index(pkmn)
+    assert sorted(index["versions"]) == ["emerald", "red-blue"]
+
+    assert project.classify_moves(pkmn, "emerald") == {"fire": [project.Move("Ember", 1, "Level-Up")]}
+    assert project.classify_moves(pkmn, "red-blue") == {"fire": [project.Move("Ember", "N/A", "Machine")]}
+    assert project.classify_moves(pkmn, "gold-silver") == {}
+    # The move was only fetched once across all three versions
+    assert fetched == ["https://pokeapi.co/api/v2/move/52/"]
+
+    # The joined index is saved to the cache for the next run
+    saved = project.cache_get(project.learnset_cache_url("charmander"))
+    assert saved["moves"] == {"https://pokeapi.co/api/v2/move/52/": ["fire", 40]}
+
+    # Once the Pokemon's response is refetched, the old index isn't used from memory or from the cache
+    project.cache_put("https://pokeapi.co/api/v2/pokemon/charmander", pkmn)
+    pkmn = {"name": "charmander", "moves": [fake_move("ember", "https://pokeapi.co/api/v2/move/52/", "gold-silver")]}
+    assert project.classify_moves(pkmn, "gold-silver") == {"fire": [project.Move("Ember", 1, "Level-Up")]}
+    assert project.classify_moves(pkmn, "emerald") == {}
+    project._learnset_indexes.clear()
+    assert project.classify_moves(pkmn, "gold-silver") == {"fire": [project.Move("Ember", 1, "Level-Up")]}
+    assert project.classify_moves(pkmn, "emerald") == {}
+    # The rebuilt index fetched the move again, and was saved with it
+    assert len(fetched) == 2
+    project._cache_db.close()
+
+def test_server(monkeypatch):
+    monkeypatch.setattr(project, "get_versions", lambda needed=(): ["emerald"])
+    monkeypatch.setattr(project, "get_version_gen", lambda version: 3)
+    monkeypatch.setattr(project, "get_gen_chart", lambda gen: (set(TYPE_CHART), TYPE_CHART))
+    def fake_pkmn_json(name):
+        if name == "missingno":
+            sys.exit(f"Pokemon named '{name}' not found.")
+        if name == "unreachable":
+            raise requests.ConnectionError("PokeAPI is down")
+        if name == "broken":
+            raise KeyError("moves")
+        return {"name": name}
+    requests = pytest.importorskip("requests")
+    monkeypatch.setattr(project, "get_pkmn_json", fake_pkmn_json)
+    monkeypatch.setattr(project, "classify_moves", lambda pkmn_json, version: {"fire": [project.Move("Ember", 1, "Level-Up")], "water": [project.Move("Water-Gun", 1, "Level-Up")]})
+
+    server = project.make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(path):
+        try:
+            with urllib.request.urlopen(base + path) as r:
+                return r.status, json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    try:
+        status, body = get("/coverage?pokemon=Charmander&version=emerald")
+        assert status == 200
+        assert body["options"][0]["types"] == ["fire", "water"]
+        assert get("/coverage?pokemon=missingno&version=emerald")[0] == 404
+        # Upstream errors and bugs still get a JSON answer instead of a dropped connection
+        assert get("/coverage?pokemon=unreachable&version=emerald") == (502, {"pokemon": "unreachable", "version": "emerald", "error": "PokeAPI is down"})
+        status, body = get("/coverage?pokemon=broken&version=emerald")
+        assert status == 500 and "KeyError" in body["error"]
+        assert get("/coverage?pokemon=charmander&version=nope")[0] == 400
+        assert get("/coverage?pokemon=charmander")[0] == 400
+        assert "memory_hits" in get("/stats")[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_benchmark_suite():
+    results = benchmark.run_suite(repeat=1)
+    normal = results["queries"]["normal"]
+    assert normal["cold"]["requests"] > normal["cold_with_chart"]["requests"] > 0
+    assert normal["cold"]["by_endpoint"]["move"]["requests"] == normal["classify_moves"]["moves"]
+    assert normal["cached"]["requests"] == 0
+    # Each endpoint breakdown adds up to its own run, not to whatever ran after it
+    for query in results["queries"].values():
+        for run in ("cold", "cold_with_chart"):
+            assert sum(c["requests"] for c in query[run]["by_endpoint"].values()) == query[run]["requests"]
+            assert sum(c["bytes"] for c in query[run]["by_endpoint"].values()) == query[run]["bytes"]
+    assert results["queries"]["smeargle"]["coverage"]["combos"] == 2380
+    assert results["queries"]["no_damaging_moves"]["coverage"]["combos"] == 0
+    # The suite puts the real API settings back when it's done
+    assert project.API_BASE == project.POKEAPI_URL
+
+def test_profile(monkeypatch, tmp_path):
+    assert project.profile_stage("off") is project._no_profile
+
+    project.start_profile()
+    try:
+        with project.profile_stage("coverage"):
+            project.get_best_combos(set(TYPE_CHART), TYPE_CHART)
+        with project.profile_stage("coverage"):
+            project.get_best_combos({"fire", "water"}, TYPE_CHART)
+        project.record_http("https://pokeapi.co/api/v2/move/52/", 1.0, 1.03, 500, 200)
+        project.record_http("https://pokeapi.co/api/v2/move/53/", 1.0, 1.002, 700, 200)
+    finally:
+        trace = project.write_profile(str(tmp_path / "profile.json"))
+
+    assert project.PROFILE is None
+    assert json.loads((tmp_path / "profile.json").read_text()) == trace
+    # 6 types choose 4, plus the single combo of 2 types
+    assert trace["combos_evaluated"] == 15 + 1
+    assert [e["name"] for e in trace["traceEvents"]] == ["coverage", "coverage", "move", "move"]
+    assert trace["stages"]["coverage"] > 0
+    assert trace["http"]["move"]["requests"] == 2
+    assert trace["http"]["move"]["bytes"] == 1200
+    assert trace["http"]["move"]["latency_ms"] == {"<50ms": 1, "<10ms": 1}
+
+def test_search_best_combos():
+    # Same answer as trying every combo, for every combo size
+    for size in range(1, 7):
+        assert project.search_best_combos(set(TYPE_CHART), TYPE_CHART, size) == project.get_best_combos(set(TYPE_CHART), TYPE_CHART, size)
+
+    # Random charts with duplicate, dominated and empty types
+    rng = random.Random(0)
+    for _ in range(200):
+        types = [f"type{i}" for i in range(rng.randint(1, 12))]
+        defenders = [f"def{i}" for i in range(rng.randint(1, 15))]
+        chart = {t: set(rng.sample(defenders, rng.randint(0, len(defenders) // 2 + 1))) for t in types}
+        size = rng.randint(1, 6)
+        assert project.search_best_combos(set(types), chart, size) == project.get_best_combos(set(types), chart, size)
+
+def test_search_prunes():
+    stats = {}
+    project.search_best_combos(set(benchmark.TYPE_CHART), benchmark.TYPE_CHART, 6, stats)
+    # C(18, 6) is 18564 combos
+    assert stats["combos"] < 18564 // 100
+
+def test_get_top_combos():
+    # Same ranking as scoring every combo and sorting, with the ABC order of the combo breaking ties
+    len_to_combos, combos_to_se = project.create_se_sets(project.get_type_combos(set(TYPE_CHART), 3), TYPE_CHART)
+    covered = {tuple(sorted(c)): se for c, se in combos_to_se.items()}
+    everything = sorted(covered, key=lambda c: (-len(covered[c]), c))
+    top, top_to_se = project.get_top_combos(set(TYPE_CHART), TYPE_CHART, 5, 3)
+    assert top == everything[:5]
+    assert all(top_to_se[c] == set().union(*(TYPE_CHART[t] for t in c)) for c in top)
+
+    # The best ones are the same as get_best_combos, and asking for more than exist gives them all
+    best, _ = project.get_best_combos(set(TYPE_CHART), TYPE_CHART, 3)
+    assert project.get_top_combos(set(TYPE_CHART), TYPE_CHART, len(best), 3)[0] == best
+    assert len(project.get_top_combos(set(TYPE_CHART), TYPE_CHART, 100, 3)[0]) == 20
+
+    # Coverage ties go to the combo with more learnable moves
+    top, _ = project.get_top_combos({"electric", "grass", "water"}, TYPE_CHART, 2, 1)
+    assert top == [("grass",), ("water",)]
+    top, _ = project.get_top_combos({"electric", "grass", "water"}, TYPE_CHART, 2, 1, {"water": 2, "electric": 5})
+    assert top == [("water",), ("grass",)]
+
+def test_get_locked_combos(monkeypatch):
+    # Same as keeping only the best of the combos that include the locked types
+    monkeypatch.setattr(project, "get_gen_chart", lambda gen: (set(TYPE_CHART), TYPE_CHART))
+    monkeypatch.setattr(project, "_gen_masks", {})
+    masks, defenders = project.get_gen_masks(1, set(TYPE_CHART))
+    _, combos_to_se = project.create_se_sets(project.get_type_combos(set(TYPE_CHART), 3), TYPE_CHART)
+    for lock in ({"fire"}, {"ice", "normal"}, {"electric", "grass", "water"}):
+        with_lock = {tuple(sorted(c)): se for c, se in combos_to_se.items() if lock <= set(c)}
+        most = max(len(se) for se in with_lock.values())
+        best, best_to_se = project.get_locked_combos(set(TYPE_CHART), lock, masks, defenders, 3)
+        assert best == sorted(c for c, se in with_lock.items() if len(se) == most)
+        assert all(best_to_se[c] == with_lock[c] for c in best)
+
+    # The masks are made once per generation, and move types outside the chart get added to them
+    assert project.get_gen_masks(1, {"fire"}) is project.get_gen_masks(1, set(TYPE_CHART))
+    monkeypatch.setattr(project, "create_type_to_se_dict", lambda types, gen, types_in_gen=None: {t: {"ghost"} for t in types})
+    masks, defenders = project.get_gen_masks(1, {"shadow"})
+    assert project.mask_to_types(masks["shadow"], defenders) == {"ghost"}
+    assert project.get_gen_masks(1, {"fire"}) == (masks, defenders)
+
+def test_solve_team():
+    # Same coverage as trying every combination of the members' masks
+    from itertools import product
+    rng = random.Random(0)
+    for _ in range(100):
+        types = [f"type{i}" for i in range(rng.randint(1, 8))]
+        defenders = [f"def{i}" for i in range(rng.randint(1, 12))]
+        chart = {t: set(rng.sample(defenders, rng.randint(0, len(defenders) // 2 + 1))) for t in types}
+        masks, _ = project.create_type_masks(chart)
+        members = [list(project.get_combo_masks(set(rng.sample(types, rng.randint(1, len(types)))), masks, 2)) for _ in range(rng.randint(1, 4))]
+
+        best = (0, 0)
+        for picks in product(*members):
+            once = twice = 0
+            for m in picks:
+                once, twice = once | m, twice | (once & m)
+            best = max(best, (once.bit_count(), twice.bit_count()))
+
+        chosen, once, twice = project.solve_team(members)
+        assert all(m in options for m, options in zip(chosen, members))
+        assert (once.bit_count(), twice.bit_count()) == best
+
+def test_analyze_team(monkeypatch):
+    monkeypatch.setattr(project, "get_version_gen", lambda version: 3)
+    monkeypatch.setattr(project, "get_gen_chart", lambda gen: (set(TYPE_CHART), TYPE_CHART))
+    monkeypatch.setattr(project, "get_pkmn_json", lambda name: {"name": name})
+    learnsets = {"squirtle": {"water", "ice", "normal"}, "pikachu": {"electric", "normal"}, "ditto": set()}
+    monkeypatch.setattr(project, "classify_moves", lambda pkmn_json, version: {t: [] for t in learnsets[pkmn_json["name"]]})
+
+    result = project.analyze_team(["Squirtle", "Pikachu", "Ditto"], "emerald", ["emerald"], size=1)
+    assert [m["pokemon"] for m in result["members"]] == ["squirtle", "pikachu", "ditto"]
+    # Only the 6 types in the chart count, so ice and water tie and ice comes first in ABC order
+    assert [m["types"] for m in result["members"]] == [["ice"], ["electric"], []]
+    assert result["covered"] == ["grass", "water"]
+    assert result["not_covered"] == ["electric", "fire", "ice", "normal"]
+
+    # Fire and water both add one type to the team, but fire also covers grass a second time
+    learnsets.update(charmander={"fire", "water"}, snorunt={"ice"})
+    result = project.analyze_team(["charmander", "snorunt", "pikachu"], "emerald", ["emerald"], size=1)
+    assert [m["types"] for m in result["members"]] == [["fire"], ["ice"], ["electric"]]
+    assert result["covered"] == ["grass", "ice", "water"]
+    assert result["covered_twice"] == ["grass"]
+
+def test_build_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(project, "API_BASE", project.API_BASE)
+    monkeypatch.setattr(project, "_session", None)
+    monkeypatch.setattr(project, "_indexes", {})
+    monkeypatch.setattr(project, "get_versions", lambda needed=(): ["emerald", "red-blue"])
+    monkeypatch.setattr(project, "get_version_gen", lambda version: 3)
+    monkeypatch.setattr(project, "get_gen_chart", lambda gen: (set(TYPE_CHART), TYPE_CHART))
+    monkeypatch.setattr(project, "get_pkmn_json", lambda name: {"name": name})
+    # Nobody is in red-blue, so those records are left out
+    monkeypatch.setattr(project, "get_learnset_index", lambda pkmn_json: {"versions": {"emerald": []}})
+    learnsets = {"squirtle": {"water", "ice", "normal"}, "pikachu": {"electric", "normal"}, "ditto": set(), "giratina-altered": {"ice"}}
+    classified = []
+    api_down = [True]
+    def fake_classify(pkmn_json, version):
+        classified.append(pkmn_json["name"])
+        if pkmn_json["name"] == "pikachu" and api_down[0]:
+            sys.exit("API is down")
+        return {t: [] for t in learnsets[pkmn_json["name"]]}
+    monkeypatch.setattr(project, "classify_moves", fake_classify)
+
+    path = str(tmp_path / "coverage.idx")
+    # Pikachu fails the first time, so the build stops without writing the index
+    with pytest.raises(SystemExit):
+        project.build_index(path, workers=1, pkmn_names=["squirtle", "pikachu", "ditto", "giratina-altered"])
+    assert not os.path.exists(path)
+
+    # Running it again only does Pikachu
+    classified.clear()
+    api_down[0] = False
+    assert project.build_index(path, workers=1, pkmn_names=["squirtle", "pikachu", "ditto", "giratina-altered"]) == 4
+    assert classified == ["pikachu"]
+    assert not os.path.exists(path + ".parts")
+
+    # Lookups give the same answer as working it out
+    names = ["squirtle", "pikachu", "ditto", "zubat", "giratina-altered", "giratina-origin", "giratina"]
+    monkeypatch.setattr(project, "_name_index", (sorted(names), {name: i for i, name in enumerate(names)}, {"giratina"}))
+    project.cache_put("https://pokeapi.co/api/v2/pokemon-species/giratina", {"varieties": [
+        {"is_default": False, "pokemon": {"name": "giratina-origin"}},
+        {"is_default": True, "pokemon": {"name": "giratina-altered"}},
+    ]})
+    for name in learnsets:
+        expected = project.analyze_pokemon(name, "emerald", ["emerald"])
+        result = project.lookup_index(path, name.title(), "emerald")
+        assert result["move_types"] == expected["move_types"]
+        assert result["options"] == expected["options"]
+        assert result["total_options"] == len(expected["options"])
+    assert project.lookup_index(path, "squirtle", "red-blue") is None
+    assert project.lookup_index(path, "zubat", "emerald") is None
+
+    # Names are checked like any other query: a species name finds its default form, and a misspelling gets suggestions
+    assert project.lookup_index(path, "Giratina", "emerald")["pokemon"] == "giratina-altered"
+    with pytest.raises(SystemExit, match="Did you mean squirtle\\?"):
+        project.lookup_index(path, "squirtel", "emerald")
+
+def test_graphql_backend(monkeypatch, stand_in):
+    monkeypatch.setattr(project, "_learnset_indexes", project.OrderedDict())
+    pkmn_json = project.get_pkmn_json("treecko")
+    stand_in.stats.clear()
+    expected = project.classify_moves(pkmn_json, "emerald")
+    assert stand_in.stats["move"]["requests"] > 1
+
+    # One request for the whole learnset, no matter how many moves
+    monkeypatch.setattr(project, "LEARNSET_BACKEND", "graphql")
+    monkeypatch.setattr(project, "GRAPHQL_URL", stand_in.graphql_url)
+    stand_in.stats.clear()
+    assert project.classify_moves(pkmn_json, "emerald") == expected
+    assert stand_in.stats == {"graphql": {"requests": 1, "bytes": stand_in.stats["graphql"]["bytes"]}}
+
+    # Another version is another query, and the same one comes from the cache
+    stand_in.stats.clear()
+    project.classify_moves(pkmn_json, "red-blue")
+    project.classify_moves(pkmn_json, "emerald")
+    assert stand_in.stats["graphql"]["requests"] == 1
+
+def test_mirror(monkeypatch, tmp_path, stand_in):
+    import tarfile
+    monkeypatch.setattr(project, "TYPE_CHART_PATH", str(tmp_path / "no_chart.json"))
+    monkeypatch.setattr(project, "MIRROR_DIR", None)
+    monkeypatch.setattr(project, "_mirror_ids", {})
+    project.clear_memory_caches()
+
+    # The expected answer comes from the stand-in server
+    expected = project.analyze_pokemon("treecko", "emerald", project.get_versions(["emerald"]))
+    project.clear_memory_caches()
+
+    # Import from an archive shaped like a download of the api-data repo
+    benchmark.write_mirror(stand_in.fixture_dir, str(tmp_path / "dump"))
+    archive = str(tmp_path / "api-data.tar.gz")
+    with tarfile.open(archive, "w:gz") as t:
+        t.add(str(tmp_path / "dump" / "data"), arcname="api-data-master/data")
+    mirror = str(tmp_path / "mirror")
+    assert project.import_mirror(archive, mirror) > 0
+    monkeypatch.setattr(project, "MIRROR_DIR", mirror)
+    assert all(not missing for missing in project.verify_mirror().values())
+
+    # Everything comes from files, nothing from the network
+    def no_network(*args):
+        raise AssertionError("network used")
+    monkeypatch.setattr(project, "http_get", no_network)
+    project.get_cache_db().execute("DELETE FROM responses WHERE url LIKE '%#learnset'")
+    cached = project.get_cache_db().execute("SELECT key, fetched FROM responses").fetchall()
+    assert project.analyze_pokemon("treecko", "emerald", project.get_versions(["emerald"])) == expected
+    # Nor does anything go into the response cache, learnsets included
+    assert project.get_cache_db().execute("SELECT key, fetched FROM responses").fetchall() == cached
+    with pytest.raises(SystemExit):
+        project.get_pkmn_json("missingno")
+
+    os.remove(os.path.join(mirror, "data", "api", "v2", "move", "5", "index.json"))
+    assert project.verify_mirror()["move"] == ["move-5"]
+    # A file missing from an incomplete mirror is reported as that, not as a bad name
+    project.clear_memory_caches()
+    with pytest.raises(SystemExit, match="missing from the mirror"):
+        project.url_to_json("https://pokeapi.co/api/v2/move/5/")
+    with pytest.raises(ValueError):
+        project.url_to_json("https://pokeapi.co/api/v2/move/missingno/")
+
+def test_resolve_pkmn_name(monkeypatch, stand_in):
+    monkeypatch.setattr(project, "_name_index", None)
+    fixture_dir = stand_in.fixture_dir
+    names = ["pikachu", "giratina-altered", "treecko", "mr-mime", "ho-oh", "type-null", "giratina-origin", "pikachu-rock-star"]
+    species = ["pikachu", "giratina", "treecko", "mr-mime", "ho-oh", "type-null"]
+    benchmark.write_fixture(fixture_dir, "/api/v2/pokemon", {"count": len(names), "results": [{"name": name, "url": ""} for name in names]})
+    benchmark.write_fixture(fixture_dir, "/api/v2/pokemon-species", {"count": len(species), "results": [{"name": name, "url": ""} for name in species]})
+    benchmark.write_fixture(fixture_dir, "/api/v2/pokemon-species/giratina", {"varieties": [
+        {"is_default": False, "pokemon": {"name": "giratina-origin"}},
+        {"is_default": True, "pokemon": {"name": "giratina-altered"}},
+    ]})
+
+    # Without the lists, names go to the API as they are, and the lists are tried again next time
+    monkeypatch.setattr(project, "OFFLINE", True)
+    assert project.resolve_pkmn_name("Treeko") == "treeko"
+    assert project._name_index is None
+    monkeypatch.setattr(project, "OFFLINE", False)
+
+    assert project.resolve_pkmn_name("Treecko") == "treecko"
+    assert project.resolve_pkmn_name("Mr Mime") == "mr-mime"
+    # A species name goes to the species' default form
+    assert project.resolve_pkmn_name("giratina") == "giratina-altered"
+    assert project.get_pkmn_json("treecko")["name"] == "treecko"
+
+    # Misses are caught without asking the API for the Pokemon, and come with suggestions
+    stand_in.stats.clear()
+    with pytest.raises(SystemExit, match="Did you mean treecko\\?"):
+        project.get_pkmn_json("treeko")
+    with pytest.raises(SystemExit, match="Did you mean pikachu, pikachu-rock-star\\?"):
+        project.resolve_pkmn_name("pika")
+    # The start of a name isn't guessed at, even when only one name starts with it
+    for start, name in (("ho", "ho-oh"), ("type", "type-null"), ("mr", "mr-mime")):
+        with pytest.raises(SystemExit, match=name):
+            project.resolve_pkmn_name(start)
+    assert stand_in.stats == {}
+
+    assert project.suggest_names("girtina-orign") == ["giratina-origin"]
+    assert project.edit_distance("kitten", "sitting", 5) == 3
+    assert project.edit_distance("kitten", "sitting", 1) == 2
+    project.clear_memory_caches()
+
+def test_renderers():
+    moves = {"water": [project.Move("Surf", "N/A", "Machine"), project.Move("Water-Gun", 7, "Level-Up")], "ice": [project.Move("Ice-Beam", "N/A", "Machine")]}
+    combos = [("ice", "water")]
+    combos_to_se = {("ice", "water"): {"fire", "grass", "ground"}}
+
+    def render(fmt):
+        result = {"pokemon": "squirtle", "version": "emerald", "generation": 3, "moves": moves, "move_types": ["ice", "water"], "dual": False,
+                  "options": project.iter_options(combos, combos_to_se, {"fire", "grass", "ground", "water"})}
+        out = io.StringIO()
+        project.RENDERERS[fmt](result, out)
+        return out.getvalue()
+
+    option = {"types": ["ice", "water"], "covered": ["fire", "grass", "ground"], "not_covered": ["water"]}
+    # Same shape as a batch result, with moves sorted by method in each type
+    assert json.loads(render("json")) == {
+        "pokemon": "squirtle", "version": "emerald", "generation": 3,
+        "moves": {"ice": [["Ice-Beam", "N/A", "Machine"]], "water": [["Water-Gun", 7, "Level-Up"], ["Surf", "N/A", "Machine"]]},
+        "move_types": ["ice", "water"], "options": [option],
+    }
+
+    records = [json.loads(line) for line in render("jsonl").splitlines()]
+    assert [r["record"] for r in records] == ["pokemon", "move", "move", "move", "option"]
+    assert records[2] == {"record": "move", "type": "water", "name": "Water-Gun", "level": 7, "method": "Level-Up"}
+    assert records[4] == {"record": "option", "rank": 1, **option}
+
+    rows = render("csv").splitlines()
+    assert rows[0] == "record,pokemon,version,type,name,level,method,rank,types,covered,not_covered"
+    assert rows[1] == "move,squirtle,emerald,ice,Ice-Beam,N/A,Machine,,,,"
+    assert rows[-1] == "option,squirtle,emerald,,,,,1,ice water,fire grass ground,water"
+
+    table = render("table")
+    assert "DAMAGING MOVES LEARNED BY SQUIRTLE" in table and "Option 1" in table and "Water-Gun" in table